@@ -0,0 +1,56 @@
+"""Look up API keys by their sha256 digest
+
+Revision ID: 3c6d2b1f8a47
+Revises: 9a505cc7eca9
+Create Date: 2026-10-15 09:12:40.318205
+
+"""
+
+import hashlib
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "3c6d2b1f8a47"
+down_revision: Union[str, None] = "9a505cc7eca9"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+tokens = sa.table("tokens", sa.column("id", sa.String), sa.column("key", sa.String), sa.column("key_hash", sa.LargeBinary(32)))
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("tokens"):
+        # fresh database, the server creates the table with key_hash
+        return
+    if "key_hash" not in {column["name"] for column in inspector.get_columns("tokens")}:
+        op.add_column("tokens", sa.Column("key_hash", sa.LargeBinary(32), nullable=True))
+
+    # backfill in python: sqlite has no sha256() and postgres would need pgcrypto for it
+    connection = op.get_bind()
+    rows = connection.execute(sa.select(tokens.c.id, tokens.c.key).where(tokens.c.key_hash.is_(None))).all()
+    for token_id, key in rows:
+        key_hash = hashlib.sha256(key.encode("utf-8")).digest()
+        connection.execute(tokens.update().where(tokens.c.id == token_id).values(key_hash=key_hash))
+
+    indexes = {index["name"] for index in inspector.get_indexes("tokens")}
+    with op.batch_alter_table("tokens") as batch_op:
+        batch_op.alter_column("key_hash", existing_type=sa.LargeBinary(32), nullable=False)
+        if "tokens_idx_key" in indexes:
+            batch_op.drop_index("tokens_idx_key")
+        if "tokens_idx_key_hash" not in indexes:
+            batch_op.create_index("tokens_idx_key_hash", ["key_hash"], unique=True)
+
+
+def downgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("tokens"):
+        return
+    with op.batch_alter_table("tokens") as batch_op:
+        batch_op.drop_index("tokens_idx_key_hash")
+        batch_op.drop_column("key_hash")
+        batch_op.create_index("tokens_idx_key", ["key"])
@@ -0,0 +1,51 @@
+"""Create the metadata lookup indexes on databases that predate them
+
+Revision ID: 5b8a0d3e1c72
+Revises: 7e1f4c9d2a60
+Create Date: 2026-10-15 14:05:27.118904
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "5b8a0d3e1c72"
+down_revision: Union[str, None] = "7e1f4c9d2a60"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (index name, table, columns), matching the declarations on the models
+INDEXES = [
+    # list_jobs / list_jobs_batch filter on user_id
+    ("jobs_idx_user_completed", "jobs", ["user_id", "completed_at"]),
+    # OrganizationMixin foreign key
+    ("ix_user__organization_id", "user", ["_organization_id"]),
+    ("tokens_idx_user", "tokens", ["user_id"]),
+    ("agent_source_mapping_idx_agent", "agent_source_mapping", ["agent_id", "source_id"]),
+    ("agent_source_mapping_idx_source", "agent_source_mapping", ["source_id"]),
+    # keyset scan in iter_files_from_source
+    ("files_idx_source_id", "files", ["source_id", "id"]),
+    # get_tool by name, public or owned by the user
+    ("tools_idx_name_user", "tools", ["name", "user_id"]),
+    # get_blocks filters on user_id and usually label
+    ("block_idx_user_label", "block", ["user_id", "label"]),
+]
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    # fresh databases get these from create_all, only tables created before the indexes existed are altered
+    for name, table, columns in INDEXES:
+        if inspector.has_table(table) and name not in {index["name"] for index in inspector.get_indexes(table)}:
+            op.create_index(name, table, columns)
+
+
+def downgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    for name, table, _ in reversed(INDEXES):
+        if inspector.has_table(table) and name in {index["name"] for index in inspector.get_indexes(table)}:
+            op.drop_index(name, table_name=table)
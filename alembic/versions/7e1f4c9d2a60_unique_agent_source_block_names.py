@@ -0,0 +1,63 @@
+"""Enforce agent, source and template block name uniqueness in the database
+
+Revision ID: 7e1f4c9d2a60
+Revises: 3c6d2b1f8a47
+Create Date: 2026-10-15 09:48:03.771562
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "7e1f4c9d2a60"
+down_revision: Union[str, None] = "3c6d2b1f8a47"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _check_no_duplicates(table: str, columns: Sequence[str], where: str = "") -> None:
+    """The constraint can't be added over existing duplicates, list them instead of failing on an opaque IntegrityError"""
+    group_by = ", ".join(columns)
+    duplicates = (
+        op.get_bind().execute(sa.text(f"SELECT {group_by}, COUNT(*) FROM {table} {where} GROUP BY {group_by} HAVING COUNT(*) > 1")).all()
+    )
+    if duplicates:
+        raise RuntimeError(f"Rename or delete the duplicate rows in {table} before upgrading, ({group_by}, count): {duplicates}")
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+
+    # fresh databases get these from create_all, only tables created before the constraints existed are altered
+    for table in ("agents", "sources"):
+        name = f"uq_{table}_user_name"
+        if not inspector.has_table(table) or name in {uc["name"] for uc in inspector.get_unique_constraints(table)}:
+            continue
+        _check_no_duplicates(table, ["user_id", "name"])
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.create_unique_constraint(name, ["user_id", "name"])
+
+    if inspector.has_table("block") and "uq_block_template_user_name_label" not in {ix["name"] for ix in inspector.get_indexes("block")}:
+        _check_no_duplicates("block", ["user_id", "name", "label"], where="WHERE template")
+        op.create_index(
+            "uq_block_template_user_name_label",
+            "block",
+            ["user_id", "name", "label"],
+            unique=True,
+            postgresql_where=sa.text("template"),
+            sqlite_where=sa.text("template"),
+        )
+
+
+def downgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if inspector.has_table("block"):
+        op.drop_index("uq_block_template_user_name_label", table_name="block")
+    for table in ("agents", "sources"):
+        if inspector.has_table(table):
+            with op.batch_alter_table(table) as batch_op:
+                batch_op.drop_constraint(f"uq_{table}_user_name", type_="unique")
@@ -0,0 +1,49 @@
+"""Store agents.tools as JSONB with a GIN index on postgres
+
+Revision ID: a41d7c2e9b53
+Revises: 5b8a0d3e1c72
+Create Date: 2026-10-15 14:31:52.604417
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "a41d7c2e9b53"
+down_revision: Union[str, None] = "5b8a0d3e1c72"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    # sqlite keeps the plain JSON column and has no GIN index
+    if bind.dialect.name != "postgresql":
+        return
+    inspector = sa.inspect(bind)
+    if not inspector.has_table("agents"):
+        return
+
+    columns = {column["name"]: column for column in inspector.get_columns("agents")}
+    if not isinstance(columns["tools"]["type"], postgresql.JSONB):
+        op.alter_column("agents", "tools", type_=postgresql.JSONB(), existing_type=sa.JSON(), postgresql_using="tools::jsonb")
+    if "agents_idx_tools" not in {index["name"] for index in inspector.get_indexes("agents")}:
+        op.create_index("agents_idx_tools", "agents", ["tools"], postgresql_using="gin")
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        return
+    inspector = sa.inspect(bind)
+    if not inspector.has_table("agents"):
+        return
+
+    if "agents_idx_tools" in {index["name"] for index in inspector.get_indexes("agents")}:
+        op.drop_index("agents_idx_tools", table_name="agents")
+    op.alter_column("agents", "tools", type_=sa.JSON(), existing_type=postgresql.JSONB(), postgresql_using="tools::json")
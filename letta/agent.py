@@ -1512,20 +1512,21 @@ def save_agent(agent: Agent, ms: MetadataStore):
     agent_id = agent_state.id
     assert isinstance(agent_state.memory, Memory), f"Memory is not a Memory object: {type(agent_state.memory)}"
 
-    # NOTE: we're saving agent memory before persisting the agent to ensure
-    # that allocated block_ids for each memory block are present in the agent model
-    save_agent_memory(agent=agent, ms=ms)
-
-    if ms.get_agent(agent_id=agent.agent_state.id):
-        ms.update_agent(agent_state)
-    else:
-        ms.create_agent(agent_state)
+    # one transaction for the blocks, agent and tools: a single commit per save instead of one per write
+    with ms.unit_of_work():
+        # NOTE: we're saving agent memory before persisting the agent to ensure
+        # that allocated block_ids for each memory block are present in the agent model
+        save_agent_memory(agent=agent, ms=ms)
+
+        if ms.get_agent(agent_id=agent.agent_state.id):
+            ms.update_agent(agent_state)
+        else:
+            ms.create_agent(agent_state)
 
-    for tool in agent.tools:
-        if ms.get_tool(tool_name=tool.name, user_id=tool.user_id) is None:
-            ms.create_tool(tool)
+        for tool in agent.tools:
+            ms.create_tool_if_missing(tool)
 
-    agent.agent_state = ms.get_agent(agent_id=agent_id)
+        agent.agent_state = ms.get_agent(agent_id=agent_id)
     assert isinstance(agent.agent_state.memory, Memory), f"Memory is not a Memory object: {type(agent_state.memory)}"
 
 
@@ -13,6 +13,7 @@ from sqlalchemy import (
     TypeDecorator,
     and_,
     asc,
+    delete,
     desc,
     or_,
     select,
@@ -341,7 +342,8 @@ class SQLStorageConnector(StorageConnector):
     def delete(self, filters: Optional[Dict] = {}):
         filters = self.get_filters(filters)
         with self.session_maker() as session:
-            session.query(self.db_model).filter(*filters).delete()
+            # Core DELETE: the session is fresh, so skip synchronizing (scanning) its identity map
+            session.execute(delete(self.db_model).where(*filters).execution_options(synchronize_session=False))
             session.commit()
 
 
@@ -1562,7 +1562,9 @@ class LocalClient(AbstractClient):
             raise ValueError(f"Either agent_id or agent_name must be provided")
         if agent_id and agent_name:
             raise ValueError(f"Only one of agent_id or agent_name can be provided")
-        existing = self.list_agents()
+        # only id and name are read, so skip building full AgentState records
+        self.interface.clear()
+        existing = self.server.ms.list_agents(user_id=self.user_id, lazy=True)
         if agent_id:
             return str(agent_id) in [str(agent.id) for agent in existing]
         else:
@@ -20,9 +20,9 @@ def get_completions_settings(defaults="simple") -> dict:
     printd(f"Loading default settings from '{defaults}'")
     if defaults == "simple":
         # simple = basic stop strings
-        settings = simple_settings
+        settings = {**simple_settings}
     elif defaults == "deterministic_mirostat":
-        settings = det_miro_settings
+        settings = {**det_miro_settings}
     elif defaults is None:
         settings = dict()
     else:
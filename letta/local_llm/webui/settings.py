@@ -1,24 +1,39 @@
-SIMPLE = {
-    # "stopping_strings": [
-    "stop": [
-        "\nUSER:",
-        "\nASSISTANT:",
-        "\nFUNCTION RETURN:",
-        "\nUSER",
-        "\nASSISTANT",
-        "\nFUNCTION RETURN",
-        "\nFUNCTION",
-        "\nFUNC",
-        "<|im_start|>",
-        "<|im_end|>",
-        "<|im_sep|>",
-        # '\n' +
-        # '</s>',
-        # '<|',
-        # '\n#',
-        # '\n\n\n',
-    ],
-    # "max_tokens": 3072,
-    # "truncation_length": 4096,  # assuming llama2 models
-    # "truncation_length": LLM_MAX_TOKENS,  # assuming mistral 7b
-}
+from types import MappingProxyType
+
+# Immutable so it can be shared across requests without defensive copies,
+# build a per-request dict with {**SIMPLE, ...} instead of mutating it.
+# Sorted longest first, so a scan settles on the most specific stop string ("\nUSER:" before "\nUSER")
+_STOP = tuple(
+    sorted(
+        (
+            "\nUSER:",
+            "\nASSISTANT:",
+            "\nFUNCTION RETURN:",
+            "\nUSER",
+            "\nASSISTANT",
+            "\nFUNCTION RETURN",
+            "\nFUNCTION",
+            "\nFUNC",
+            "<|im_start|>",
+            "<|im_end|>",
+            "<|im_sep|>",
+            # '\n' +
+            # '</s>',
+            # '<|',
+            # '\n#',
+            # '\n\n\n',
+        ),
+        key=len,
+        reverse=True,
+    )
+)
+
+SIMPLE = MappingProxyType(
+    {
+        # "stopping_strings": _STOP,
+        "stop": _STOP,
+        # "max_tokens": 3072,
+        # "truncation_length": 4096,  # assuming llama2 models
+        # "truncation_length": LLM_MAX_TOKENS,  # assuming mistral 7b
+    }
+)
@@ -1,9 +1,19 @@
 """ Metadata store for user/agent/data_source information"""
 
+import csv
+import hashlib
+import io
 import os
 import secrets
-from typing import List, Optional
-
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from datetime import datetime
+from functools import lru_cache
+from itertools import groupby
+from operator import attrgetter
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+import orjson
 from sqlalchemy import (
     BIGINT,
     JSON,
@@ -12,12 +22,26 @@ from sqlalchemy import (
     DateTime,
     Index,
     Integer,
+    LargeBinary,
     String,
     TypeDecorator,
+    UniqueConstraint,
     asc,
+    bindparam,
+    create_engine,
+    delete,
+    insert,
+    lambda_stmt,
+    literal,
     or_,
+    select,
+    update,
 )
-from sqlalchemy.sql import func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.sql import func, text
 
 from letta.config import LettaConfig
 from letta.orm.base import Base
@@ -30,17 +54,17 @@ from letta.schemas.file import FileMetadata
 from letta.schemas.job import Job
 from letta.schemas.llm_config import LLMConfig
 from letta.schemas.memory import Memory
-from letta.schemas.openai.chat_completions import ToolCall, ToolCallFunction
+from letta.schemas.openai.chat_completions import ToolCall
 from letta.schemas.source import Source
 from letta.schemas.tool import Tool
 from letta.schemas.user import User
 from letta.settings import settings
-from letta.utils import enforce_types, get_utc_time, printd
+from letta.utils import enforce_types, uuid7
 
 
 class FileMetadataModel(Base):
     __tablename__ = "files"
-    __table_args__ = {"extend_existing": True}
+    __table_args__ = (Index("files_idx_source_id", "source_id", "id"), {"extend_existing": True})
 
     id = Column(String, primary_key=True, nullable=False)
     user_id = Column(String, nullable=False)
@@ -58,19 +82,89 @@ class FileMetadataModel(Base):
     def __repr__(self):
         return f"<FileMetadata(id='{self.id}', source_id='{self.source_id}', file_name='{self.file_name}')>"
 
+    # record fields read in one C-level attrgetter call per row
+    _FIELDS = (
+        "id",
+        "user_id",
+        "source_id",
+        "file_name",
+        "file_path",
+        "file_type",
+        "file_size",
+        "file_creation_date",
+        "file_last_modified_date",
+        "created_at",
+    )
+    _GET = attrgetter(*_FIELDS)
+
     def to_record(self):
-        return FileMetadata(
-            id=self.id,
-            user_id=self.user_id,
-            source_id=self.source_id,
-            file_name=self.file_name,
-            file_path=self.file_path,
-            file_type=self.file_type,
-            file_size=self.file_size,
-            file_creation_date=self.file_creation_date,
-            file_last_modified_date=self.file_last_modified_date,
-            created_at=self.created_at,
+        return FileMetadata(**dict(zip(self._FIELDS, self._GET(self))))
+
+
+def json_serializer(value) -> str:
+    """JSON serializer for the SQLAlchemy engine, used by every JSON column (orjson instead of stdlib json)"""
+    return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY).decode("utf-8")
+
+
+def json_deserializer(value):
+    """JSON deserializer for the SQLAlchemy engine, used by every JSON column (orjson instead of stdlib json)"""
+    return orjson.loads(value)
+
+
+# compiled SQL cache entries per engine (SQLAlchemy's default is 500), sized so the hot reads stay compiled
+QUERY_CACHE_SIZE = 1200
+# rows per multi-VALUES INSERT when bulk paths (create_jobs, _bulk_insert) hand an executemany to the driver
+INSERTMANYVALUES_PAGE_SIZE = 1000
+
+
+@lru_cache(maxsize=None)
+def get_engine(uri: str) -> Engine:
+    """Create the SQLAlchemy engine for `uri` once per process, so every session factory shares one connection pool
+
+    Pool sizing comes from settings (LETTA_DB_POOL_SIZE, LETTA_DB_MAX_OVERFLOW, LETTA_DB_POOL_RECYCLE,
+    LETTA_DB_POOL_TIMEOUT, LETTA_DB_POOL_USE_LIFO); sqlite keeps SQLAlchemy's defaults.
+    """
+    if uri.startswith("sqlite"):
+        return create_engine(
+            uri,
+            query_cache_size=QUERY_CACHE_SIZE,
+            insertmanyvalues_page_size=INSERTMANYVALUES_PAGE_SIZE,
+            json_serializer=json_serializer,
+            json_deserializer=json_deserializer,
         )
+    return create_engine(
+        uri,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_recycle=settings.db_pool_recycle,
+        pool_timeout=settings.db_pool_timeout,
+        pool_use_lifo=settings.db_pool_use_lifo,
+        pool_pre_ping=True,
+        connect_args={"application_name": "letta"},
+        query_cache_size=QUERY_CACHE_SIZE,
+        insertmanyvalues_page_size=INSERTMANYVALUES_PAGE_SIZE,
+        json_serializer=json_serializer,
+        json_deserializer=json_deserializer,
+    )
+
+
+# configs are read back on every agent load and are almost always identical across rows,
+# so validated models are cached by their (key-sorted) JSON text and handed out as copies
+CONFIG_CACHE_SIZE = 4096
+
+
+def _config_cache_key(value: dict) -> bytes:
+    return orjson.dumps(value, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)
+
+
+@lru_cache(maxsize=CONFIG_CACHE_SIZE)
+def _load_llm_config(key: bytes) -> LLMConfig:
+    return LLMConfig(**orjson.loads(key))
+
+
+@lru_cache(maxsize=CONFIG_CACHE_SIZE)
+def _load_embedding_config(key: bytes) -> EmbeddingConfig:
+    return EmbeddingConfig(**orjson.loads(key))
 
 
 class LLMConfigColumn(TypeDecorator):
@@ -91,7 +185,7 @@ class LLMConfigColumn(TypeDecorator):
 
     def process_result_value(self, value, dialect):
         if value:
-            return LLMConfig(**value)
+            return _load_llm_config(_config_cache_key(value)).model_copy()
         return value
 
 
@@ -113,7 +207,7 @@ class EmbeddingConfigColumn(TypeDecorator):
 
     def process_result_value(self, value, dialect):
         if value:
-            return EmbeddingConfig(**value)
+            return _load_embedding_config(_config_cache_key(value)).model_copy()
         return value
 
 
@@ -139,15 +233,9 @@ class ToolCallColumn(TypeDecorator):
 
     def process_result_value(self, value, dialect):
         if value:
-            tools = []
-            for tool_value in value:
-                if "function" in tool_value:
-                    tool_call_function = ToolCallFunction(**tool_value["function"])
-                    del tool_value["function"]
-                else:
-                    tool_call_function = None
-                tools.append(ToolCall(function=tool_call_function, **tool_value))
-            return tools
+            # one pydantic-core validation per call (nested function included) straight from the orjson-decoded dicts
+            validate = ToolCall.model_validate
+            return [validate(tool_value) for tool_value in value]
         return value
 
 
@@ -167,18 +255,21 @@ class APIKeyModel(Base):
     """Data model for authentication tokens. One-to-many relationship with UserModel (1 User - N tokens)."""
 
     __tablename__ = "tokens"
+    __table_args__ = (
+        Index("tokens_idx_user", "user_id"),
+        Index("tokens_idx_key_hash", "key_hash", unique=True),
+    )
 
     id = Column(String, primary_key=True)
     # each api key is tied to a user account (that it validates access for)
     user_id = Column(String, nullable=False)
     # the api key
     key = Column(String, nullable=False)
+    # sha256 digest of the key, used for lookups (fixed-width unique index instead of comparing the plaintext)
+    key_hash = Column(LargeBinary(32), nullable=False)
     # extra (optional) metadata
     name = Column(String)
 
-    Index(__tablename__ + "_idx_user", user_id),
-    Index(__tablename__ + "_idx_key", key),
-
     def __repr__(self) -> str:
         return f"<APIKey(id='{self.id}', key='{self.key}', name='{self.name}')>"
 
@@ -191,19 +282,28 @@ class APIKeyModel(Base):
         )
 
 
-def generate_api_key(prefix="sk-", length=51) -> str:
-    # Generate 'length // 2' bytes because each byte becomes two hex digits. Adjust length for prefix.
-    actual_length = max(length - len(prefix), 1) // 2  # Ensure at least 1 byte is generated
-    random_bytes = secrets.token_bytes(actual_length)
-    new_key = prefix + random_bytes.hex()
-    return new_key
+API_KEY_MAX_RETRIES = 3
+
+
+def hash_api_key(api_key: str) -> bytes:
+    return hashlib.sha256(api_key.encode("utf-8")).digest()
+
+
+def generate_api_key(prefix="sk-", nbytes=24) -> str:
+    # each byte becomes two hex digits, so the default key is "sk-" + 48 hex characters (51 total, as before)
+    return f"{prefix}{secrets.token_hex(nbytes)}"
 
 
 class AgentModel(Base):
     """Defines data model for storing Passages (consisting of text, embedding)"""
 
     __tablename__ = "agents"
-    __table_args__ = {"extend_existing": True}
+    __table_args__ = (
+        UniqueConstraint("user_id", "name", name="uq_agents_user_name"),
+        # containment lookups on tool names (e.g. agents using a given tool), postgres only
+        Index("agents_idx_tools", "tools", postgresql_using="gin").ddl_if(dialect="postgresql"),
+        {"extend_existing": True},
+    )
 
     id = Column(String, primary_key=True)
     user_id = Column(String, nullable=False)
@@ -215,7 +315,9 @@ class AgentModel(Base):
     message_ids = Column(JSON)
     memory = Column(JSON)
     system = Column(String)
-    tools = Column(JSON)
+    # JSONB on postgres: stored pre-parsed and GIN-indexable (a list, so JSONB's key reordering doesn't apply;
+    # memory stays JSON because block order matters)
+    tools = Column(JSON().with_variant(postgresql.JSONB(), "postgresql"))
 
     # configs
     agent_type = Column(String)
@@ -225,11 +327,6 @@ class AgentModel(Base):
     # state
     metadata_ = Column(JSON)
 
-    # tools
-    tools = Column(JSON)
-
-    Index(__tablename__ + "_idx_user", user_id),
-
     def __repr__(self) -> str:
         return f"<Agent(id='{self.id}', name='{self.name}')>"
 
@@ -252,12 +349,71 @@ class AgentModel(Base):
         assert isinstance(agent_state.memory, Memory), f"Memory object is not of type Memory: {type(agent_state.memory)}"
         return agent_state
 
+    def to_lazy_record(self) -> "LazyAgentState":
+        return LazyAgentState(self)
+
+
+class LazyAgentState:
+    """Read-only view over an agent row that defers `Memory.load` and `AgentState` validation until they are needed.
+
+    Column values (id, name, tools, llm_config, ...) are read straight off the row, `memory` is loaded on first access,
+    and any other attribute falls through to a full `AgentState` that is built once via `to_record()`.
+    """
+
+    __slots__ = ("_row", "_memory", "_agent_state")
+
+    _COLUMNS = frozenset(
+        (
+            "id",
+            "user_id",
+            "name",
+            "created_at",
+            "description",
+            "message_ids",
+            "system",
+            "tools",
+            "agent_type",
+            "llm_config",
+            "embedding_config",
+            "metadata_",
+        )
+    )
+
+    def __init__(self, row: AgentModel):
+        self._row = row
+        self._memory = None
+        self._agent_state = None
+
+    def __getattr__(self, name):
+        # only reached for unset slots (e.g. on a copy.copy or unpickled instance), reading them here would recurse
+        if name in LazyAgentState.__slots__:
+            raise AttributeError(name)
+        if name in LazyAgentState._COLUMNS:
+            return getattr(self._row, name)
+        return getattr(self.to_record(), name)
+
+    def __repr__(self) -> str:
+        return f"<LazyAgentState(id='{self._row.id}', name='{self._row.name}')>"
+
+    @property
+    def memory(self) -> Memory:
+        if self._agent_state is not None:
+            return self._agent_state.memory
+        if self._memory is None:
+            self._memory = Memory.load(self._row.memory)  # load dictionary
+        return self._memory
+
+    def to_record(self) -> AgentState:
+        if self._agent_state is None:
+            self._agent_state = self._row.to_record()
+        return self._agent_state
+
 
 class SourceModel(Base):
     """Defines data model for storing Passages (consisting of text, embedding)"""
 
     __tablename__ = "sources"
-    __table_args__ = {"extend_existing": True}
+    __table_args__ = (UniqueConstraint("user_id", "name", name="uq_sources_user_name"), {"extend_existing": True})
 
     # Assuming passage_id is the primary key
     # id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
@@ -268,43 +424,58 @@ class SourceModel(Base):
     embedding_config = Column(EmbeddingConfigColumn)
     description = Column(String)
     metadata_ = Column(JSON)
-    Index(__tablename__ + "_idx_user", user_id),
 
     # TODO: add num passages
 
     def __repr__(self) -> str:
         return f"<Source(passage_id='{self.id}', name='{self.name}')>"
 
+    _FIELDS = ("id", "user_id", "name", "created_at", "embedding_config", "description", "metadata_")
+    _GET = attrgetter(*_FIELDS)
+
     def to_record(self) -> Source:
-        return Source(
-            id=self.id,
-            user_id=self.user_id,
-            name=self.name,
-            created_at=self.created_at,
-            embedding_config=self.embedding_config,
-            description=self.description,
-            metadata_=self.metadata_,
-        )
+        return Source(**dict(zip(self._FIELDS, self._GET(self))))
 
 
 class AgentSourceMappingModel(Base):
     """Stores mapping between agent -> source"""
 
     __tablename__ = "agent_source_mapping"
+    __table_args__ = (
+        Index("agent_source_mapping_idx_agent", "agent_id", "source_id"),
+        Index("agent_source_mapping_idx_source", "source_id"),
+    )
 
     id = Column(String, primary_key=True)
     user_id = Column(String, nullable=False)
     agent_id = Column(String, nullable=False)
     source_id = Column(String, nullable=False)
-    Index(__tablename__ + "_idx_user", user_id, agent_id, source_id),
 
     def __repr__(self) -> str:
         return f"<AgentSourceMapping(user_id='{self.user_id}', agent_id='{self.agent_id}', source_id='{self.source_id}')>"
 
 
+# block labels that map to a more specific schema than `Block`
+BLOCK_CLASSES_BY_LABEL = {"persona": Persona, "human": Human}
+
+
 class BlockModel(Base):
     __tablename__ = "block"
-    __table_args__ = {"extend_existing": True}
+    __table_args__ = (
+        # only template blocks (saved humans/personas) need unique names
+        Index(
+            "uq_block_template_user_name_label",
+            "user_id",
+            "name",
+            "label",
+            unique=True,
+            postgresql_where=text("template"),
+            sqlite_where=text("template"),
+        ),
+        # get_blocks filters on user_id and usually label ("human" / "persona"); user_id alone uses the leading column
+        Index("block_idx_user_label", "user_id", "label"),
+        {"extend_existing": True},
+    )
 
     id = Column(String, primary_key=True, nullable=False)
     value = Column(String, nullable=False)
@@ -315,53 +486,30 @@ class BlockModel(Base):
     metadata_ = Column(JSON)
     description = Column(String)
     user_id = Column(String)
-    Index(__tablename__ + "_idx_user", user_id),
 
     def __repr__(self) -> str:
         return f"<Block(id='{self.id}', name='{self.name}', template='{self.template}', label='{self.label}', user_id='{self.user_id}')>"
 
+    _FIELDS = ("id", "value", "limit", "name", "template", "label", "metadata_", "description", "user_id")
+
     def to_record(self) -> Block:
-        if self.label == "persona":
-            return Persona(
-                id=self.id,
-                value=self.value,
-                limit=self.limit,
-                name=self.name,
-                template=self.template,
-                label=self.label,
-                metadata_=self.metadata_,
-                description=self.description,
-                user_id=self.user_id,
-            )
-        elif self.label == "human":
-            return Human(
-                id=self.id,
-                value=self.value,
-                limit=self.limit,
-                name=self.name,
-                template=self.template,
-                label=self.label,
-                metadata_=self.metadata_,
-                description=self.description,
-                user_id=self.user_id,
-            )
-        else:
-            return Block(
-                id=self.id,
-                value=self.value,
-                limit=self.limit,
-                name=self.name,
-                template=self.template,
-                label=self.label,
-                metadata_=self.metadata_,
-                description=self.description,
-                user_id=self.user_id,
-            )
+        block_cls = BLOCK_CLASSES_BY_LABEL.get(self.label, Block)
+        return block_cls(
+            id=self.id,
+            value=self.value,
+            limit=self.limit,
+            name=self.name,
+            template=self.template,
+            label=self.label,
+            metadata_=self.metadata_,
+            description=self.description,
+            user_id=self.user_id,
+        )
 
 
 class ToolModel(Base):
     __tablename__ = "tools"
-    __table_args__ = {"extend_existing": True}
+    __table_args__ = (Index("tools_idx_name_user", "name", "user_id"), {"extend_existing": True})
 
     id = Column(String, primary_key=True)
     name = Column(String, nullable=False)
@@ -376,25 +524,20 @@ class ToolModel(Base):
     def __repr__(self) -> str:
         return f"<Tool(id='{self.id}', name='{self.name}')>"
 
+    _FIELDS = ("id", "name", "user_id", "description", "source_type", "source_code", "json_schema", "module", "tags")
+    _GET = attrgetter(*_FIELDS)
+
     def to_record(self) -> Tool:
-        return Tool(
-            id=self.id,
-            name=self.name,
-            user_id=self.user_id,
-            description=self.description,
-            source_type=self.source_type,
-            source_code=self.source_code,
-            json_schema=self.json_schema,
-            module=self.module,
-            tags=self.tags,
-        )
+        return Tool(**dict(zip(self._FIELDS, self._GET(self))))
 
 
 class JobModel(Base):
     __tablename__ = "jobs"
-    __table_args__ = {"extend_existing": True}
+    # list_jobs filters on user_id; completed_at rides along for per-user completion ordering
+    __table_args__ = (Index("jobs_idx_user_completed", "user_id", "completed_at"), {"extend_existing": True})
 
-    id = Column(String, primary_key=True)
+    # time-ordered UUIDv7 ids (same format as Job's id factory) keep inserts at the tail of the primary key index
+    id = Column(String, primary_key=True, default=lambda: f"job-{uuid7()}")
     user_id = Column(String)
     status = Column(String, default=JobStatus.pending)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -404,15 +547,186 @@ class JobModel(Base):
     def __repr__(self) -> str:
         return f"<Job(id='{self.id}', status='{self.status}')>"
 
+    _FIELDS = ("id", "user_id", "status", "created_at", "completed_at", "metadata_")
+    _GET = attrgetter(*_FIELDS)
+
     def to_record(self):
-        return Job(
-            id=self.id,
-            user_id=self.user_id,
-            status=self.status,
-            created_at=self.created_at,
-            completed_at=self.completed_at,
-            metadata_=self.metadata_,
-        )
+        return Job(**dict(zip(self._FIELDS, self._GET(self))))
+
+
+# record fields persisted for each model, used instead of `vars(record)` (which also carries private attributes)
+AGENT_FIELDS = (
+    "id",
+    "user_id",
+    "name",
+    "created_at",
+    "description",
+    "message_ids",
+    "memory",
+    "system",
+    "tools",
+    "agent_type",
+    "llm_config",
+    "embedding_config",
+    "metadata_",
+)
+SOURCE_FIELDS = SourceModel._FIELDS
+BLOCK_FIELDS = BlockModel._FIELDS
+TOOL_FIELDS = ToolModel._FIELDS
+JOB_FIELDS = JobModel._FIELDS
+API_KEY_FIELDS = ("id", "user_id", "key", "name")
+
+# the hottest single-row reads, built once: lambda statements are cached by code location, so no expression tree is
+# constructed per call and the compiled SQL is reused
+GET_JOB_STMT = lambda_stmt(lambda: select(JobModel.__table__).where(JobModel.id == bindparam("job_id")).limit(1))
+GET_API_KEY_STMT = lambda_stmt(lambda: select(APIKeyModel).where(APIKeyModel.key_hash == bindparam("key_hash")).limit(2))
+GET_API_KEY_USER_ID_STMT = lambda_stmt(
+    lambda: select(APIKeyModel.__table__.c.user_id).where(APIKeyModel.__table__.c.key_hash == bindparam("key_hash"))
+)
+# single-row deletes by primary key, against the tables so no ORM identity map synchronization is set up either
+DELETE_JOB_STMT = lambda_stmt(lambda: delete(JobModel.__table__).where(JobModel.__table__.c.id == bindparam("id")))
+DELETE_TOOL_STMT = lambda_stmt(lambda: delete(ToolModel.__table__).where(ToolModel.__table__.c.id == bindparam("id")))
+DELETE_BLOCK_STMT = lambda_stmt(lambda: delete(BlockModel.__table__).where(BlockModel.__table__.c.id == bindparam("id")))
+
+
+def _dialect_insert(session, model_cls):
+    """`insert()` for the session's dialect, which exposes `on_conflict_do_update` / `on_conflict_do_nothing`"""
+    if session.get_bind().dialect.name == "postgresql":
+        return postgresql.insert(model_cls)
+    return sqlite.insert(model_cls)
+
+
+@lru_cache(maxsize=None)
+def _row_getter(fields: Tuple[str, ...]) -> attrgetter:
+    return attrgetter(*fields)
+
+
+def _to_row(record, fields: Tuple[str, ...]) -> dict:
+    # one C-level attrgetter call per record (the *_FIELDS tuples all have several fields, so it returns a tuple)
+    return dict(zip(fields, _row_getter(fields)(record)))
+
+
+def _record_select(model_cls):
+    """Core select of the columns behind `model_cls.to_record()`, for building records from mappings without ORM instances"""
+    columns = model_cls.__table__.c
+    return select(*(columns[field] for field in model_cls._FIELDS))
+
+
+def _exists(session, stmt) -> bool:
+    """SELECT EXISTS (stmt): the database stops at the first matching row (`session` may also be a Connection)"""
+    return session.execute(select(stmt.exists())).scalar()
+
+
+def _job_update_values(values: dict) -> dict:
+    """Let the database stamp completed_at (func.now()) when a job is updated to completed without a completion time
+
+    Any other update keeps the stored completed_at, the column's onupdate=func.now() would otherwise stamp it on every write.
+    """
+    if values.get("status") == JobStatus.completed and values.get("completed_at") is None:
+        values["completed_at"] = func.now()
+    elif "completed_at" not in values:
+        values["completed_at"] = JobModel.completed_at
+    return values
+
+
+def _changed_fields(existing, row: dict) -> dict:
+    """Subset of `row` whose values differ from the loaded ORM instance `existing`"""
+    return {field: value for field, value in row.items() if getattr(existing, field) != value}
+
+
+def _agent_row(agent: AgentState) -> dict:
+    row = _to_row(agent, AGENT_FIELDS)
+    if isinstance(row["memory"], Memory):
+        row["memory"] = row["memory"].to_dict()
+    return row
+
+
+# PostgreSQL-only: remove a row and its agent -> source mappings in one round-trip
+DELETE_AGENT_CASCADE_SQL = text(
+    "WITH deleted AS (DELETE FROM agents WHERE id = :id RETURNING id) DELETE FROM agent_source_mapping WHERE agent_id = :id"
+)
+DELETE_SOURCE_CASCADE_SQL = text(
+    "WITH deleted AS (DELETE FROM sources WHERE id = :id RETURNING id) DELETE FROM agent_source_mapping WHERE source_id = :id"
+)
+# PostgreSQL-only: remove all of a user's agents, sources and mappings in one round-trip
+DELETE_USER_CASCADE_SQL = text(
+    "WITH deleted_agents AS (DELETE FROM agents WHERE user_id = :user_id RETURNING id), "
+    "deleted_sources AS (DELETE FROM sources WHERE user_id = :user_id RETURNING id) "
+    "DELETE FROM agent_source_mapping WHERE user_id = :user_id"
+)
+
+# max values bound into a single IN (...) clause
+IN_CLAUSE_BATCH_SIZE = 10000
+
+# batch size when streaming file metadata rows
+FILES_YIELD_PER = 500
+
+# batch size when streaming job rows
+JOBS_YIELD_PER = 1000
+
+# below this many rows a regular executemany INSERT is as fast as COPY
+COPY_MIN_ROWS = 100
+
+
+def _copy_cell(value):
+    """Format a single value as a cell of a COPY (FORMAT csv) stream"""
+    if value is None:
+        return r"\N"
+    if isinstance(value, (dict, list)):
+        return json_serializer(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _copy_rows(session, table_name: str, columns: Tuple[str, ...], rows: List[tuple]):
+    """Stream rows into a PostgreSQL table with COPY ... FROM STDIN on the session's raw DBAPI connection"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter="\t", quoting=csv.QUOTE_MINIMAL)
+    for row in rows:
+        writer.writerow([_copy_cell(v) for v in row])
+    buffer.seek(0)
+
+    sql = f"COPY {table_name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, DELIMITER E'\\t', NULL '\\N')"
+    cursor = session.connection().connection.cursor()
+    try:
+        if hasattr(cursor, "copy_expert"):  # psycopg2
+            cursor.copy_expert(sql, buffer)
+        else:  # pg8000
+            cursor.execute(sql, stream=buffer)
+    finally:
+        cursor.close()
+
+
+def _copy_rows_skip_existing(session, table_name: str, columns: Tuple[str, ...], rows: List[tuple]):
+    """COPY rows into a temp table, then move them over with INSERT ... ON CONFLICT DO NOTHING (COPY itself can't skip rows)"""
+    staging_name = f"{table_name}_staging"
+    column_list = ", ".join(columns)
+    session.execute(text(f"CREATE TEMP TABLE {staging_name} (LIKE {table_name} INCLUDING DEFAULTS) ON COMMIT DROP"))
+    _copy_rows(session, staging_name, columns, rows)
+    session.execute(text(f"INSERT INTO {table_name} ({column_list}) SELECT {column_list} FROM {staging_name} ON CONFLICT DO NOTHING"))
+
+
+class _TransactionSession:
+    """Session handed to MetadataStore methods inside `transaction()`: `commit()` only flushes, the block commits once"""
+
+    __slots__ = ("_session",)
+
+    def __init__(self, session):
+        self._session = session
+
+    def commit(self):
+        self._session.flush()
+        # Core UPDATE/upsert statements don't touch loaded instances, so expire them as a real commit would have been
+        # followed by a fresh session: later reads in the unit see the flushed rows instead of stale identity-map copies
+        self._session.expire_all()
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+
+# session shared by every MetadataStore call made inside `MetadataStore.unit_of_work()` in the current context
+_current_session: ContextVar[Optional[_TransactionSession]] = ContextVar("letta_metadata_session", default=None)
 
 
 class MetadataStore:
@@ -433,139 +747,262 @@ class MetadataStore:
         # Ensure valid URI
         assert self.uri, "Database URI is not provided or is invalid."
 
-        from letta.server.server import db_context
-
-        self.session_maker = db_context
+        # `get_engine` is cached per URI, so this shares the server's pool whenever both point at the same database
+        self.engine = get_engine(self.uri)
+        # expire_on_commit=False: records are converted to pydantic right after commit, don't re-SELECT them
+        self._session_factory = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=self.engine)
+        self.session_maker = self._scoped_session
+
+    def _scoped_session(self):
+        """The unit-of-work session if one is active in this context, otherwise a fresh session"""
+        shared = _current_session.get()
+        return nullcontext(shared) if shared is not None else self._session_factory()
+
+    def _connect(self):
+        """Plain connection for single-statement Core reads, skipping ORM session setup"""
+        shared = _current_session.get()
+        return nullcontext(shared.connection()) if shared is not None else self.engine.connect()
+
+    @contextmanager
+    def unit_of_work(self):
+        """Run every MetadataStore call in this context (e.g. one API request) on one session, committed once on exit:
+
+        with ms.unit_of_work():
+            job = ms.get_job(job_id)
+            ms.update_job_status(job_id, JobStatus.completed)
+
+        This also covers calls made through other MetadataStore instances and helpers further down the stack.
+        Nested units join the outer one. NOTE: the session is not thread-safe, so don't fan calls
+        out to other threads inside a unit of work.
+        """
+        if _current_session.get() is not None:
+            yield
+            return
+        with self._session_factory() as session:
+            token = _current_session.set(_TransactionSession(session))
+            try:
+                yield
+                session.commit()
+            finally:
+                _current_session.reset(token)
+
+    @contextmanager
+    def transaction(self):
+        """Share one session (and one pooled connection) across several calls:
+
+        with ms.transaction() as txn:
+            agent = txn.get_agent(agent_id=agent_id)
+            txn.update_agent(agent)
+            sources = txn.list_attached_sources(agent_id=agent_id)
+
+        `txn` exposes the full MetadataStore API. The methods' own commits only flush; everything is committed once
+        when the block exits (and rolled back if it raises). NOTE: a method that rolls back on error (e.g. a duplicate
+        name in `create_agent`) rolls back the whole shared session.
+        """
+        with self.unit_of_work():
+            yield self
+
+    def _bulk_insert(self, model_cls, records: List[dict]):
+        """Insert many rows into `model_cls`'s table with a single executemany and one commit"""
+        if not records:
+            return
+        with self.session_maker() as session:
+            session.execute(insert(model_cls), records)
+            session.commit()
 
     @enforce_types
     def create_api_key(self, user_id: str, name: str) -> APIKey:
         """Create an API key for a user"""
-        new_api_key = generate_api_key()
-        with self.session_maker() as session:
-            if session.query(APIKeyModel).filter(APIKeyModel.key == new_api_key).count() > 0:
-                # NOTE duplicate API keys / tokens should never happen, but if it does don't allow it
-                raise ValueError(f"Token {new_api_key} already exists")
-            # TODO store the API keys as hashed
-            assert user_id and name, "User ID and name must be provided"
+        assert user_id and name, "User ID and name must be provided"
+        # NOTE duplicate API keys / tokens should never happen, but if one does the unique index on key_hash rejects it and we draw again
+        for _ in range(API_KEY_MAX_RETRIES):
+            new_api_key = generate_api_key()
+            # TODO drop the plaintext key column once listing keys no longer returns them (lookups use key_hash)
             token = APIKey(user_id=user_id, key=new_api_key, name=name)
-            session.add(APIKeyModel(**vars(token)))
-            session.commit()
+            with self.session_maker() as session:
+                session.add(APIKeyModel(**_to_row(token, API_KEY_FIELDS), key_hash=hash_api_key(new_api_key)))
+                try:
+                    session.commit()
+                    break
+                except IntegrityError:
+                    session.rollback()
+        else:
+            raise ValueError(f"Failed to generate a unique API key after {API_KEY_MAX_RETRIES} attempts")
         return self.get_api_key(api_key=new_api_key)
 
     @enforce_types
     def delete_api_key(self, api_key: str):
         """Delete an API key from the database"""
         with self.session_maker() as session:
-            session.query(APIKeyModel).filter(APIKeyModel.key == api_key).delete()
+            query = delete(APIKeyModel).where(APIKeyModel.key_hash == hash_api_key(api_key))
+            session.execute(query.execution_options(synchronize_session=False))
             session.commit()
 
     @enforce_types
     def get_api_key(self, api_key: str) -> Optional[APIKey]:
         with self.session_maker() as session:
-            results = session.query(APIKeyModel).filter(APIKeyModel.key == api_key).all()
-            if len(results) == 0:
-                return None
-            assert len(results) == 1, f"Expected 1 result, got {len(results)}"  # should only be one result
-            return results[0].to_record()
+            result = session.execute(GET_API_KEY_STMT, {"key_hash": hash_api_key(api_key)}).scalar_one_or_none()
+            return result.to_record() if result else None
+
+    @enforce_types
+    def get_user_id_for_api_key(self, api_key: str) -> Optional[str]:
+        """Resolve an API key to its user id (the auth path) with a Core select of the one column it needs"""
+        with self._connect() as conn:
+            return conn.execute(GET_API_KEY_USER_ID_STMT, {"key_hash": hash_api_key(api_key)}).scalar_one_or_none()
 
     @enforce_types
     def get_all_api_keys_for_user(self, user_id: str) -> List[APIKey]:
         with self.session_maker() as session:
-            results = session.query(APIKeyModel).filter(APIKeyModel.user_id == user_id).all()
-            tokens = [r.to_record() for r in results]
+            results = session.execute(select(APIKeyModel).where(APIKeyModel.user_id == user_id)).scalars()
+            to_record = APIKeyModel.to_record
+            tokens = [to_record(r) for r in results]
             return tokens
 
     @enforce_types
     def create_agent(self, agent: AgentState):
         # insert into agent table
-        # make sure agent.name does not already exist for user user_id
-        with self.session_maker() as session:
-            if session.query(AgentModel).filter(AgentModel.name == agent.name).filter(AgentModel.user_id == agent.user_id).count() > 0:
-                raise ValueError(f"Agent with name {agent.name} already exists")
-            fields = vars(agent)
-            fields["memory"] = agent.memory.to_dict()
-            del fields["_internal_memory"]
-            session.add(AgentModel(**fields))
-            session.commit()
+        # agent.name must be unique for user user_id (enforced by uq_agents_user_name)
+        with self.session_maker() as session:
+            session.add(AgentModel(**_agent_row(agent)))
+            try:
+                session.commit()
+            except IntegrityError as e:
+                session.rollback()
+                raise ValueError(f"Agent with name {agent.name} already exists") from e
 
     @enforce_types
     def create_source(self, source: Source):
         with self.session_maker() as session:
-            if session.query(SourceModel).filter(SourceModel.name == source.name).filter(SourceModel.user_id == source.user_id).count() > 0:
-                raise ValueError(f"Source with name {source.name} already exists for user {source.user_id}")
-            session.add(SourceModel(**vars(source)))
-            session.commit()
+            session.add(SourceModel(**_to_row(source, SOURCE_FIELDS)))
+            try:
+                session.commit()
+            except IntegrityError as e:
+                session.rollback()
+                raise ValueError(f"Source with name {source.name} already exists for user {source.user_id}") from e
 
     @enforce_types
     def create_block(self, block: Block):
         with self.session_maker() as session:
-            # TODO: fix?
-            # we are only validating that more than one template block
-            # with a given name doesn't exist.
-            if (
-                session.query(BlockModel)
-                .filter(BlockModel.name == block.name)
-                .filter(BlockModel.user_id == block.user_id)
-                .filter(BlockModel.template == True)
-                .filter(BlockModel.label == block.label)
-                .count()
-                > 0
-            ):
-
-                raise ValueError(f"Block with name {block.name} already exists")
-            session.add(BlockModel(**vars(block)))
-            session.commit()
+            # NOTE: only template blocks are checked for duplicate names (enforced by uq_block_template_user_name_label)
+            session.add(BlockModel(**_to_row(block, BLOCK_FIELDS)))
+            try:
+                session.commit()
+            except IntegrityError as e:
+                session.rollback()
+                raise ValueError(f"Block with name {block.name} already exists") from e
 
     @enforce_types
     def create_tool(self, tool: Tool):
         with self.session_maker() as session:
-            if self.get_tool(tool_id=tool.id, tool_name=tool.name, user_id=tool.user_id) is not None:
+            # same check as get_tool(tool_id=...), without loading the row in a second session
+            if _exists(session, select(ToolModel.id).where(ToolModel.id == tool.id)):
                 raise ValueError(f"Tool with name {tool.name} already exists")
-            session.add(ToolModel(**vars(tool)))
+            session.add(ToolModel(**_to_row(tool, TOOL_FIELDS)))
             session.commit()
 
+    def create_tool_if_missing(self, tool: Tool) -> bool:
+        """Insert `tool` unless get_tool(tool_name=tool.name, user_id=tool.user_id) would find one, return whether it was inserted
+
+        One INSERT ... SELECT ... WHERE NOT EXISTS statement instead of a get_tool round-trip followed by create_tool.
+        (tool names are only unique per user and public tools have no user_id, so there is no unique index for ON CONFLICT)
+        """
+        row = _to_row(tool, TOOL_FIELDS)
+        if tool.user_id is None:
+            visible = ToolModel.user_id == None
+        else:
+            visible = or_(ToolModel.user_id == None, ToolModel.user_id == tool.user_id)
+        taken = select(ToolModel.id).where(ToolModel.name == tool.name, visible).exists()
+        columns = ToolModel.__table__.c
+        values = select(*(literal(row[field], columns[field].type).label(field) for field in TOOL_FIELDS)).where(~taken)
+        with self.session_maker() as session:
+            inserted = session.execute(insert(ToolModel).from_select(TOOL_FIELDS, values)).rowcount
+            session.commit()
+        return inserted > 0
+
+    def create_agents(self, agents: List[AgentState]):
+        """Insert many agents at once (NOTE: a name the user already has fails the whole batch with an IntegrityError)"""
+        self._bulk_insert(AgentModel, [_agent_row(agent) for agent in agents])
+
+    def create_sources(self, sources: List[Source]):
+        """Insert many sources at once (NOTE: a name the user already has fails the whole batch with an IntegrityError)"""
+        self._bulk_insert(SourceModel, [_to_row(source, SOURCE_FIELDS) for source in sources])
+
+    def create_blocks(self, blocks: List[Block]):
+        """Insert many blocks at once (NOTE: a duplicate template block name fails the whole batch with an IntegrityError)"""
+        self._bulk_insert(BlockModel, [_to_row(block, BLOCK_FIELDS) for block in blocks])
+
+    def create_tools(self, tools: List[Tool]):
+        """Insert many tools at once (NOTE: no existence check like `create_tool`, an existing id fails the batch with an IntegrityError)"""
+        self._bulk_insert(ToolModel, [_to_row(tool, TOOL_FIELDS) for tool in tools])
+
     @enforce_types
     def update_agent(self, agent: AgentState):
         with self.session_maker() as session:
-            fields = vars(agent)
-            if isinstance(agent.memory, Memory):  # TODO: this is nasty but this whole class will soon be removed so whatever
-                fields["memory"] = agent.memory.to_dict()
-            del fields["_internal_memory"]
-            session.query(AgentModel).filter(AgentModel.id == agent.id).update(fields)
-            session.commit()
+            existing = session.get(AgentModel, agent.id)
+            if existing is None:
+                return
+            # only write the columns that changed (avoids re-serializing memory/configs/tools every save)
+            changed = _changed_fields(existing, _agent_row(agent))
+            if changed:
+                session.query(AgentModel).filter(AgentModel.id == agent.id).update(changed)
+                session.commit()
 
     @enforce_types
     def update_source(self, source: Source):
         with self.session_maker() as session:
-            session.query(SourceModel).filter(SourceModel.id == source.id).update(vars(source))
-            session.commit()
+            existing = session.get(SourceModel, source.id)
+            if existing is None:
+                return
+            changed = _changed_fields(existing, _to_row(source, SOURCE_FIELDS))
+            if changed:
+                session.query(SourceModel).filter(SourceModel.id == source.id).update(changed)
+                session.commit()
 
     @enforce_types
     def update_block(self, block: Block):
         with self.session_maker() as session:
-            session.query(BlockModel).filter(BlockModel.id == block.id).update(vars(block))
+            session.query(BlockModel).filter(BlockModel.id == block.id).update(_to_row(block, BLOCK_FIELDS))
             session.commit()
 
     @enforce_types
     def update_or_create_block(self, block: Block):
         with self.session_maker() as session:
-            existing_block = session.query(BlockModel).filter(BlockModel.id == block.id).first()
-            if existing_block:
-                session.query(BlockModel).filter(BlockModel.id == block.id).update(vars(block))
-            else:
-                session.add(BlockModel(**vars(block)))
+            # INSERT ... ON CONFLICT (id) DO UPDATE, so the existence check happens in the same statement
+            stmt = _dialect_insert(session, BlockModel).values(**_to_row(block, BLOCK_FIELDS))
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[BlockModel.id],
+                set_={field: stmt.excluded[field] for field in BLOCK_FIELDS if field != "id"},
+            )
+            session.execute(stmt)
             session.commit()
 
     @enforce_types
     def update_tool(self, tool_id: str, tool: Tool):
         with self.session_maker() as session:
-            session.query(ToolModel).filter(ToolModel.id == tool_id).update(vars(tool))
-            session.commit()
+            existing = session.get(ToolModel, tool_id)
+            if existing is None:
+                return
+            changed = _changed_fields(existing, _to_row(tool, TOOL_FIELDS))
+            if changed:
+                session.query(ToolModel).filter(ToolModel.id == tool_id).update(changed)
+                session.commit()
 
     @enforce_types
     def delete_tool(self, tool_id: str):
         with self.session_maker() as session:
-            session.query(ToolModel).filter(ToolModel.id == tool_id).delete()
+            session.execute(DELETE_TOOL_STMT, {"id": tool_id})
+            session.commit()
+
+    def delete_tools(self, tool_names: List[str], user_id: Optional[str]):
+        """Delete a user's tools by name (public tools when user_id is None) with one DELETE per IN_CLAUSE_BATCH_SIZE names"""
+        tool_names = list(tool_names)
+        if not tool_names:
+            return
+        owner = ToolModel.user_id == user_id if user_id else ToolModel.user_id == None
+        with self.session_maker() as session:
+            for i in range(0, len(tool_names), IN_CLAUSE_BATCH_SIZE):
+                query = delete(ToolModel).where(owner, ToolModel.name.in_(tool_names[i : i + IN_CLAUSE_BATCH_SIZE]))
+                session.execute(query.execution_options(synchronize_session=False))
             session.commit()
 
     @enforce_types
@@ -586,60 +1023,92 @@ class MetadataStore:
     @enforce_types
     def delete_block(self, block_id: str):
         with self.session_maker() as session:
-            session.query(BlockModel).filter(BlockModel.id == block_id).delete()
+            session.execute(DELETE_BLOCK_STMT, {"id": block_id})
+            session.commit()
+
+    def delete_blocks(self, block_ids: List[str]):
+        """Delete many blocks with one DELETE per IN_CLAUSE_BATCH_SIZE ids and a single commit"""
+        block_ids = list(block_ids)
+        if not block_ids:
+            return
+        with self.session_maker() as session:
+            for i in range(0, len(block_ids), IN_CLAUSE_BATCH_SIZE):
+                query = delete(BlockModel).where(BlockModel.id.in_(block_ids[i : i + IN_CLAUSE_BATCH_SIZE]))
+                session.execute(query.execution_options(synchronize_session=False))
             session.commit()
 
     @enforce_types
     def delete_agent(self, agent_id: str):
         with self.session_maker() as session:
+            if session.get_bind().dialect.name == "postgresql":
+                # delete agent and mappings in a single statement
+                session.execute(DELETE_AGENT_CASCADE_SQL, {"id": agent_id})
+            else:
+                # SQLite does not support data-modifying CTEs
+                # delete agents
+                session.execute(delete(AgentModel).where(AgentModel.id == agent_id).execution_options(synchronize_session=False))
 
-            # delete agents
-            session.query(AgentModel).filter(AgentModel.id == agent_id).delete()
-
-            # delete mappings
-            session.query(AgentSourceMappingModel).filter(AgentSourceMappingModel.agent_id == agent_id).delete()
+                # delete mappings
+                query = delete(AgentSourceMappingModel).where(AgentSourceMappingModel.agent_id == agent_id)
+                session.execute(query.execution_options(synchronize_session=False))
 
             session.commit()
 
     @enforce_types
     def delete_source(self, source_id: str):
         with self.session_maker() as session:
-            # delete from sources table
-            session.query(SourceModel).filter(SourceModel.id == source_id).delete()
+            if session.get_bind().dialect.name == "postgresql":
+                # delete source and mappings in a single statement
+                session.execute(DELETE_SOURCE_CASCADE_SQL, {"id": source_id})
+            else:
+                # SQLite does not support data-modifying CTEs
+                # delete from sources table
+                session.execute(delete(SourceModel).where(SourceModel.id == source_id).execution_options(synchronize_session=False))
 
-            # delete any mappings
-            session.query(AgentSourceMappingModel).filter(AgentSourceMappingModel.source_id == source_id).delete()
+                # delete any mappings
+                query = delete(AgentSourceMappingModel).where(AgentSourceMappingModel.source_id == source_id)
+                session.execute(query.execution_options(synchronize_session=False))
 
             session.commit()
 
     @enforce_types
     def list_tools(self, cursor: Optional[str] = None, limit: Optional[int] = 50, user_id: Optional[str] = None) -> List[ToolModel]:
-        with self.session_maker() as session:
-            # Query for public tools or user-specific tools
-            query = session.query(ToolModel).filter(or_(ToolModel.user_id == None, ToolModel.user_id == user_id))
+        with self._connect() as conn:
+            # Query for public tools or user-specific tools (one OR'd predicate, just the public ones without a user)
+            if user_id:
+                query = _record_select(ToolModel).where(or_(ToolModel.user_id == None, ToolModel.user_id == user_id))
+            else:
+                query = _record_select(ToolModel).where(ToolModel.user_id == None)
 
             # Apply cursor if provided (assuming cursor is an ID)
             if cursor:
-                query = query.filter(ToolModel.id > cursor)
+                query = query.where(ToolModel.id > cursor)
 
             # Order by ID and apply limit
-            results = query.order_by(asc(ToolModel.id)).limit(limit).all()
+            results = conn.execute(query.order_by(asc(ToolModel.id)).limit(limit)).mappings()
 
-            # Convert to records
-            res = [r.to_record() for r in results]
-            return res
+            # Convert to records (plain column mappings, no ORM instances)
+            return [Tool(**r) for r in results]
 
     @enforce_types
-    def list_agents(self, user_id: str) -> List[AgentState]:
+    def list_agents(self, user_id: str, lazy: bool = False) -> Union[List[AgentState], List[LazyAgentState]]:
+        """List a user's agents. With `lazy=True`, returns `LazyAgentState` views for callers that only read a few fields."""
         with self.session_maker() as session:
-            results = session.query(AgentModel).filter(AgentModel.user_id == user_id).all()
-            return [r.to_record() for r in results]
+            results = session.execute(select(AgentModel).where(AgentModel.user_id == user_id)).scalars()
+            to_record = AgentModel.to_lazy_record if lazy else AgentModel.to_record
+            return [to_record(r) for r in results]
 
     @enforce_types
-    def list_sources(self, user_id: str) -> List[Source]:
-        with self.session_maker() as session:
-            results = session.query(SourceModel).filter(SourceModel.user_id == user_id).all()
-            return [r.to_record() for r in results]
+    def list_sources(self, user_id: str, cursor: Optional[str] = None, limit: Optional[int] = None) -> List[Source]:
+        """List a user's sources, all of them by default or a page of `limit` after the `cursor` source id"""
+        with self._connect() as conn:
+            query = _record_select(SourceModel).where(SourceModel.user_id == user_id)
+            if cursor:
+                query = query.where(SourceModel.id > cursor)
+            if limit is not None:
+                query = query.order_by(asc(SourceModel.id)).limit(limit)
+            results = conn.execute(query).mappings()
+            return [Source(**r) for r in results]
 
     @enforce_types
     def get_agent(
@@ -647,15 +1116,13 @@ class MetadataStore:
     ) -> Optional[AgentState]:
         with self.session_maker() as session:
             if agent_id:
-                results = session.query(AgentModel).filter(AgentModel.id == agent_id).all()
+                # primary key lookup, no uniqueness check needed
+                result = session.get(AgentModel, agent_id)
             else:
                 assert agent_name is not None and user_id is not None, "Must provide either agent_id or agent_name"
-                results = session.query(AgentModel).filter(AgentModel.name == agent_name).filter(AgentModel.user_id == user_id).all()
-
-            if len(results) == 0:
-                return None
-            assert len(results) == 1, f"Expected 1 result, got {len(results)}"  # should only be one result
-            return results[0].to_record()
+                query = select(AgentModel).where(AgentModel.name == agent_name, AgentModel.user_id == user_id)
+                result = session.execute(query.limit(2)).scalar_one_or_none()  # should only be one result
+            return result.to_record() if result else None
 
     @enforce_types
     def get_source(
@@ -663,14 +1130,12 @@ class MetadataStore:
     ) -> Optional[Source]:
         with self.session_maker() as session:
             if source_id:
-                results = session.query(SourceModel).filter(SourceModel.id == source_id).all()
+                result = session.get(SourceModel, source_id)
             else:
                 assert user_id is not None and source_name is not None
-                results = session.query(SourceModel).filter(SourceModel.name == source_name).filter(SourceModel.user_id == user_id).all()
-            if len(results) == 0:
-                return None
-            assert len(results) == 1, f"Expected 1 result, got {len(results)}"
-            return results[0].to_record()
+                query = select(SourceModel).where(SourceModel.name == source_name, SourceModel.user_id == user_id)
+                result = session.execute(query.limit(2)).scalar_one_or_none()
+            return result.to_record() if result else None
 
     @enforce_types
     def get_tool(
@@ -678,34 +1143,31 @@ class MetadataStore:
     ) -> Optional[ToolModel]:
         with self.session_maker() as session:
             if tool_id:
-                results = session.query(ToolModel).filter(ToolModel.id == tool_id).all()
+                result = session.get(ToolModel, tool_id)
             else:
                 assert tool_name is not None
-                results = session.query(ToolModel).filter(ToolModel.name == tool_name).filter(ToolModel.user_id == None).all()
+                query = session.query(ToolModel).filter(ToolModel.name == tool_name)
                 if user_id:
-                    results += session.query(ToolModel).filter(ToolModel.name == tool_name).filter(ToolModel.user_id == user_id).all()
-            if len(results) == 0:
-                return None
-            # assert len(results) == 1, f"Expected 1 result, got {len(results)}"
-            return results[0].to_record()
+                    # public tools take precedence over user tools with the same name
+                    query = query.filter(or_(ToolModel.user_id == None, ToolModel.user_id == user_id)).order_by(
+                        ToolModel.user_id.isnot(None)
+                    )
+                else:
+                    query = query.filter(ToolModel.user_id == None)
+                result = query.first()
+            return result.to_record() if result else None
 
     @enforce_types
     def get_tool_with_name_and_user_id(self, tool_name: Optional[str] = None, user_id: Optional[str] = None) -> Optional[ToolModel]:
         with self.session_maker() as session:
-            results = session.query(ToolModel).filter(ToolModel.name == tool_name).filter(ToolModel.user_id == user_id).all()
-            if len(results) == 0:
-                return None
-            assert len(results) == 1, f"Expected 1 result, got {len(results)}"
-            return results[0].to_record()
+            result = session.query(ToolModel).filter(ToolModel.name == tool_name, ToolModel.user_id == user_id).limit(2).one_or_none()
+            return result.to_record() if result else None
 
     @enforce_types
     def get_block(self, block_id: str) -> Optional[Block]:
         with self.session_maker() as session:
-            results = session.query(BlockModel).filter(BlockModel.id == block_id).all()
-            if len(results) == 0:
-                return None
-            assert len(results) == 1, f"Expected 1 result, got {len(results)}"
-            return results[0].to_record()
+            result = session.get(BlockModel, block_id)
+            return result.to_record() if result else None
 
     @enforce_types
     def get_blocks(
@@ -717,30 +1179,32 @@ class MetadataStore:
         id: Optional[str] = None,
     ) -> Optional[List[Block]]:
         """List available blocks"""
-        with self.session_maker() as session:
-            query = session.query(BlockModel)
+        with self._connect() as conn:
+            # only the record columns, as plain mappings (no ORM instances)
+            query = _record_select(BlockModel)
 
             if user_id:
-                query = query.filter(BlockModel.user_id == user_id)
+                query = query.where(BlockModel.user_id == user_id)
 
             if label:
-                query = query.filter(BlockModel.label == label)
+                query = query.where(BlockModel.label == label)
 
             if name:
-                query = query.filter(BlockModel.name == name)
+                query = query.where(BlockModel.name == name)
 
             if id:
-                query = query.filter(BlockModel.id == id)
+                query = query.where(BlockModel.id == id)
 
             if template:
-                query = query.filter(BlockModel.template == template)
+                query = query.where(BlockModel.template == template)
 
-            results = query.all()
+            results = conn.execute(query).mappings().all()
 
             if len(results) == 0:
                 return None
 
-            return [r.to_record() for r in results]
+            # blocks keep their validating constructors (label defaults, char limit)
+            return [BLOCK_CLASSES_BY_LABEL.get(r["label"], Block)(**r) for r in results]
 
     # agent source metadata
     @enforce_types
@@ -748,101 +1212,219 @@ class MetadataStore:
         with self.session_maker() as session:
             # TODO: remove this (is a hack)
             mapping_id = f"{user_id}-{agent_id}-{source_id}"
-            session.add(AgentSourceMappingModel(id=mapping_id, user_id=user_id, agent_id=agent_id, source_id=source_id))
+            # the id is derived from the mapping, so re-attaching an attached source is a no-op
+            stmt = _dialect_insert(session, AgentSourceMappingModel).on_conflict_do_nothing(index_elements=["id"])
+            session.execute(stmt, {"id": mapping_id, "user_id": user_id, "agent_id": agent_id, "source_id": source_id})
+            session.commit()
+
+    def attach_sources(self, user_id: str, agent_id: str, source_ids: List[str]):
+        """Attach several sources to an agent with one multi-row INSERT (already attached sources are skipped)"""
+        if not source_ids:
+            return
+        # TODO: remove this (is a hack)
+        rows = [
+            {"id": f"{user_id}-{agent_id}-{source_id}", "user_id": user_id, "agent_id": agent_id, "source_id": source_id}
+            for source_id in source_ids
+        ]
+        with self.session_maker() as session:
+            session.execute(_dialect_insert(session, AgentSourceMappingModel).on_conflict_do_nothing(index_elements=["id"]), rows)
+            session.commit()
+
+    def bulk_attach_sources(self, mappings: List[Tuple[str, str, str]]):
+        """Attach many sources at once, given (user_id, agent_id, source_id) tuples
+
+        Repeated tuples are attached once and, like `attach_source`, already attached sources are skipped.
+        """
+        columns = ("id", "user_id", "agent_id", "source_id")
+        # TODO: remove this (is a hack)
+        # dict keyed on the mapping id: drops repeated tuples, keeps the first-seen order
+        rows = {f"{user_id}-{agent_id}-{source_id}": (user_id, agent_id, source_id) for user_id, agent_id, source_id in mappings}
+        rows = [(mapping_id, *mapping) for mapping_id, mapping in rows.items()]
+        self._bulk_insert_rows(AgentSourceMappingModel, columns, rows, skip_existing=True)
+
+    def bulk_insert_files(self, files: List[FileMetadata]):
+        """Insert many file metadata records at once"""
+        columns = (
+            "id",
+            "user_id",
+            "source_id",
+            "file_name",
+            "file_path",
+            "file_type",
+            "file_size",
+            "file_creation_date",
+            "file_last_modified_date",
+            "created_at",
+        )
+        rows = [tuple(getattr(f, c) for c in columns) for f in files]
+        self._bulk_insert_rows(FileMetadataModel, columns, rows)
+
+    def _bulk_insert_rows(self, model_cls, columns: Tuple[str, ...], rows: List[tuple], skip_existing: bool = False):
+        """Use COPY for large batches on PostgreSQL, otherwise fall back to an executemany INSERT
+
+        With `skip_existing`, rows that conflict with existing ones are skipped (ON CONFLICT DO NOTHING) instead of
+        failing the batch; COPY then goes through a temp table.
+        """
+        if not rows:
+            return
+        with self.session_maker() as session:
+            if len(rows) >= COPY_MIN_ROWS and session.get_bind().dialect.name == "postgresql":
+                copy_rows = _copy_rows_skip_existing if skip_existing else _copy_rows
+                copy_rows(session, model_cls.__tablename__, columns, rows)
+            else:
+                stmt = _dialect_insert(session, model_cls).on_conflict_do_nothing() if skip_existing else insert(model_cls)
+                session.execute(stmt, [dict(zip(columns, row)) for row in rows])
             session.commit()
 
     @enforce_types
     def list_attached_sources(self, agent_id: str) -> List[Source]:
         with self.session_maker() as session:
-            results = session.query(AgentSourceMappingModel).filter(AgentSourceMappingModel.agent_id == agent_id).all()
-
-            sources = []
-            # make sure source exists
-            for r in results:
-                source = self.get_source(source_id=r.source_id)
-                if source:
-                    sources.append(source)
-                else:
-                    printd(f"Warning: source {r.source_id} does not exist but exists in mapping database. This should never happen.")
-            return sources
+            # inner join drops mappings whose source no longer exists
+            results = (
+                session.query(SourceModel)
+                .join(AgentSourceMappingModel, AgentSourceMappingModel.source_id == SourceModel.id)
+                .filter(AgentSourceMappingModel.agent_id == agent_id)
+                .all()
+            )
+            to_record = SourceModel.to_record
+            return [to_record(r) for r in results]
 
     @enforce_types
     def list_attached_agents(self, source_id: str) -> List[str]:
         with self.session_maker() as session:
-            results = session.query(AgentSourceMappingModel).filter(AgentSourceMappingModel.source_id == source_id).all()
-
-            agent_ids = []
-            # make sure agent exists
-            for r in results:
-                agent = self.get_agent(agent_id=r.agent_id)
-                if agent:
-                    agent_ids.append(r.agent_id)
-                else:
-                    printd(f"Warning: agent {r.agent_id} does not exist but exists in mapping database. This should never happen.")
-            return agent_ids
+            # inner join drops mappings whose agent no longer exists
+            query = (
+                select(AgentSourceMappingModel.agent_id)
+                .join(AgentModel, AgentModel.id == AgentSourceMappingModel.agent_id)
+                .where(AgentSourceMappingModel.source_id == source_id)
+            )
+            # scalars: plain id strings straight off the cursor, no Row wrappers
+            return session.execute(query).scalars().all()
 
     @enforce_types
     def detach_source(self, agent_id: str, source_id: str):
         with self.session_maker() as session:
-            session.query(AgentSourceMappingModel).filter(
+            query = delete(AgentSourceMappingModel).where(
                 AgentSourceMappingModel.agent_id == agent_id, AgentSourceMappingModel.source_id == source_id
-            ).delete()
+            )
+            session.execute(query.execution_options(synchronize_session=False))
             session.commit()
 
     @enforce_types
-    def create_job(self, job: Job):
+    def create_job(self, job: Job) -> Job:
         with self.session_maker() as session:
-            session.add(JobModel(**vars(job)))
+            # single-row Core INSERT, no unit-of-work flush for an instance nobody reads back
+            session.execute(insert(JobModel), _to_row(job, JOB_FIELDS))
             session.commit()
+        # id and created_at are assigned client-side, so the inserted row is exactly `job`, no read-back needed
+        return job
+
+    def create_jobs(self, jobs: List[Job]):
+        """Insert many jobs at once, sent as multi-row INSERTs of INSERTMANYVALUES_PAGE_SIZE rows each"""
+        self._bulk_insert(JobModel, [_to_row(job, JOB_FIELDS) for job in jobs])
 
     @enforce_types
     def list_files_from_source(self, source_id: str, limit: int, cursor: Optional[str]):
+        return list(self.iter_files_from_source(source_id=source_id, limit=limit, cursor=cursor))
+
+    def iter_files_from_source(self, source_id: str, limit: int, cursor: Optional[str] = None) -> Iterator[FileMetadata]:
+        """Stream a page of a source's files (keyset-paginated on id); the session stays open until the iterator is exhausted"""
         with self.session_maker() as session:
-            # Start with the basic query filtered by source_id
-            query = session.query(FileMetadataModel).filter(FileMetadataModel.source_id == source_id)
+            # Start with the basic query filtered by source_id (plain column rows, no ORM instances)
+            query = session.query(*FileMetadataModel.__table__.c).filter(FileMetadataModel.source_id == source_id)
 
             if cursor:
                 # Assuming cursor is the ID of the last file in the previous page
                 query = query.filter(FileMetadataModel.id > cursor)
 
-            # Order by ID or other ordering criteria to ensure correct pagination
-            query = query.order_by(FileMetadataModel.id)
-
-            # Limit the number of results returned
-            results = query.limit(limit).all()
+            # Order by ID to ensure correct pagination (served by files_idx_source_id)
+            query = query.order_by(FileMetadataModel.id).limit(limit)
 
-            # Convert the results to the required FileMetadata objects
-            files = [r.to_record() for r in results]
-
-            return files
+            # Fetch rows in batches instead of materializing the whole page
+            for row in query.yield_per(FILES_YIELD_PER):
+                yield FileMetadata(**row._mapping)
 
     def delete_job(self, job_id: str):
         with self.session_maker() as session:
-            session.query(JobModel).filter(JobModel.id == job_id).delete()
+            session.execute(DELETE_JOB_STMT, {"id": job_id})
             session.commit()
 
-    def get_job(self, job_id: str) -> Optional[Job]:
+    def delete_jobs(self, job_ids: List[str]):
+        """Delete many jobs with a single DELETE ... WHERE id IN (...)"""
+        if not job_ids:
+            return
         with self.session_maker() as session:
-            results = session.query(JobModel).filter(JobModel.id == job_id).all()
-            if len(results) == 0:
-                return None
-            assert len(results) == 1, f"Expected 1 result, got {len(results)}"
-            return results[0].to_record()
+            session.execute(delete(JobModel).where(JobModel.id.in_(job_ids)).execution_options(synchronize_session=False))
+            session.commit()
 
-    def list_jobs(self, user_id: str) -> List[Job]:
-        with self.session_maker() as session:
-            results = session.query(JobModel).filter(JobModel.user_id == user_id).all()
-            return [r.to_record() for r in results]
+    def get_job(self, job_id: str) -> Optional[Job]:
+        with self._connect() as conn:
+            # id is the primary key, so at most one row can match
+            result = conn.execute(GET_JOB_STMT, {"job_id": job_id}).one_or_none()
+            return Job(**result._mapping) if result else None
+
+    def exists_job(self, job_id: str) -> bool:
+        """Whether a job with this id exists, without fetching or building the job"""
+        with self._connect() as conn:
+            return _exists(conn, select(JobModel.id).where(JobModel.id == job_id))
+
+    def list_jobs(self, user_id: str, cursor: Optional[str] = None, limit: Optional[int] = None) -> List[Job]:
+        return list(self.iter_jobs(user_id=user_id, cursor=cursor, limit=limit))
+
+    def iter_jobs(self, user_id: str, cursor: Optional[str] = None, limit: Optional[int] = None) -> Iterator[Job]:
+        """Stream a user's jobs in JOBS_YIELD_PER batches; the connection stays open until the iterator is exhausted
+
+        With `limit`, only one page of jobs after the `cursor` job id is read (ids are UUIDv7, so that is creation order).
+        """
+        with self._connect() as conn:
+            # rows come straight from the table columns, so skip ORM instances
+            query = select(JobModel.__table__).where(JobModel.user_id == user_id)
+            if cursor:
+                query = query.where(JobModel.id > cursor)
+            if limit is not None:
+                query = query.order_by(asc(JobModel.id)).limit(limit)
+            # on the statement, not the connection: inside unit_of_work() the connection is shared and would keep the option
+            for r in conn.execute(query.execution_options(yield_per=JOBS_YIELD_PER)):
+                yield Job(**r._mapping)
+
+    def list_jobs_batch(self, user_ids: List[str]) -> Dict[str, List[Job]]:
+        """List the jobs of several users with one query per IN_CLAUSE_BATCH_SIZE users (every requested id is a key)"""
+        jobs = {user_id: [] for user_id in user_ids}
+        user_ids = list(jobs)
+        with self._connect() as conn:
+            for i in range(0, len(user_ids), IN_CLAUSE_BATCH_SIZE):
+                query = select(JobModel.__table__).where(JobModel.user_id.in_(user_ids[i : i + IN_CLAUSE_BATCH_SIZE]))
+                for user_id, rows in groupby(conn.execute(query.order_by(JobModel.user_id)).all(), key=attrgetter("user_id")):
+                    jobs[user_id].extend(Job(**r._mapping) for r in rows)
+        return jobs
 
     def update_job(self, job: Job) -> Job:
+        # only write the columns that were set on the job
+        values = job.model_dump(exclude={"id"}, exclude_unset=True)
+        if not values:
+            return job
+        with self.session_maker() as session:
+            query = update(JobModel).where(JobModel.id == job.id).values(**_job_update_values(values))
+            session.execute(query.execution_options(synchronize_session=False))
+            session.commit()
+        return job
+
+    def update_jobs(self, jobs: List[Job]):
+        """Update many jobs in one transaction, only sending the fields that were set on each job"""
         with self.session_maker() as session:
-            session.query(JobModel).filter(JobModel.id == job.id).update(vars(job))
+            for job in jobs:
+                values = job.model_dump(exclude={"id"}, exclude_unset=True)
+                if not values:
+                    continue
+                # same completed_at handling as update_job (bulk_update_mappings can't carry the func.now() expression)
+                query = update(JobModel).where(JobModel.id == job.id).values(**_job_update_values(values))
+                session.execute(query.execution_options(synchronize_session=False))
             session.commit()
-        return Job
 
     def update_job_status(self, job_id: str, status: JobStatus):
+        # the database stamps the completion time (timestamptz, so no UTC conversion needed) in this same UPDATE
+        values = _job_update_values({"status": status})
         with self.session_maker() as session:
-            session.query(JobModel).filter(JobModel.id == job_id).update({"status": status})
-            if status == JobStatus.COMPLETED:
-                session.query(JobModel).filter(JobModel.id == job_id).update({"completed_at": get_utc_time()})
+            # job reads select columns and never load JobModel instances, so even a shared unit-of-work session has none to synchronize
+            session.execute(update(JobModel).where(JobModel.id == job_id).values(**values).execution_options(synchronize_session=False))
             session.commit()
@@ -3,4 +3,4 @@ class NoResultFound(Exception):
 
 
 class MalformedIdError(Exception):
-    """An id not in the right format, most likely violating uuid4 format."""
+    """An id not in the right format, most likely violating uuid4/uuid7 format."""
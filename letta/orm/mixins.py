@@ -8,11 +8,11 @@ from letta.orm.base import Base
 from letta.orm.errors import MalformedIdError
 
 
-def is_valid_uuid4(uuid_string: str) -> bool:
-    """Check if a string is a valid UUID4."""
+def is_valid_uuid(uuid_string: str) -> bool:
+    """Check if a string is a valid UUID4 or (time-ordered) UUID7."""
     try:
         uuid_obj = UUID(uuid_string)
-        return uuid_obj.version == 4
+        return uuid_obj.version in (4, 7)
     except ValueError:
         return False
 
@@ -29,7 +29,7 @@ def _relation_getter(instance: "Base", prop: str) -> Optional[str]:
 
 
 def _relation_setter(instance: "Base", prop: str, value: str) -> None:
-    """Set relation using the id with prefix, ensuring the id is a valid UUIDv4."""
+    """Set relation using the id with prefix, ensuring the id is a valid UUIDv4 or UUIDv7."""
     formatted_prop = f"_{prop}_id"
     prefix = prop.replace("_", "")
     if not value:
@@ -43,9 +43,9 @@ def _relation_setter(instance: "Base", prop: str, value: str) -> None:
     # Ensure prefix matches
     assert found_prefix == prefix, f"{found_prefix} is not a valid id prefix, expecting {prefix}"
 
-    # Validate that the id is a valid UUID4 string
-    if not is_valid_uuid4(id_):
-        raise MalformedIdError(f"Hash segment of {value} is not a valid UUID4")
+    # Validate that the id is a valid UUID4/UUID7 string
+    if not is_valid_uuid(id_):
+        raise MalformedIdError(f"Hash segment of {value} is not a valid UUID")
 
     setattr(instance, formatted_prop, id_)  # Store id as a string
 
@@ -55,8 +55,8 @@ class OrganizationMixin(Base):
 
     __abstract__ = True
 
-    # Changed _organization_id to store string (still a valid UUID4 string)
-    _organization_id: Mapped[str] = mapped_column(String, ForeignKey("organization._id"))
+    # Changed _organization_id to store string (still a valid UUID4/UUID7 string)
+    _organization_id: Mapped[str] = mapped_column(String, ForeignKey("organization._id"), index=True)
 
     @property
     def organization_id(self) -> str:
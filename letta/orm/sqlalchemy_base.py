@@ -1,14 +1,15 @@
 from typing import TYPE_CHECKING, List, Literal, Optional, Type, Union
-from uuid import UUID, uuid4
+from uuid import UUID
 
 from humps import depascalize
 from sqlalchemy import Boolean, String, select
-from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.orm import Mapped, mapped_column, raiseload
 
 from letta.log import get_logger
 from letta.orm.base import Base, CommonSqlalchemyMetaMixins
 from letta.orm.errors import NoResultFound
-from letta.orm.mixins import is_valid_uuid4
+from letta.orm.mixins import is_valid_uuid
+from letta.utils import uuid7
 
 if TYPE_CHECKING:
     from pydantic import BaseModel
@@ -24,7 +25,7 @@ class SqlalchemyBase(CommonSqlalchemyMetaMixins, Base):
 
     __order_by_default__ = "created_at"
 
-    _id: Mapped[str] = mapped_column(String, primary_key=True, default=lambda: f"{uuid4()}")
+    _id: Mapped[str] = mapped_column(String, primary_key=True, default=lambda: f"{uuid7()}")
 
     deleted: Mapped[bool] = mapped_column(Boolean, default=False, doc="Is this record deleted? Used for universal soft deletes.")
 
@@ -43,7 +44,7 @@ class SqlalchemyBase(CommonSqlalchemyMetaMixins, Base):
             return
         prefix, id_ = value.split("-", 1)
         assert prefix == self.__prefix__(), f"{prefix} is not a valid id prefix for {self.__class__.__name__}"
-        assert is_valid_uuid4(id_), f"{id_} is not a valid uuid4"
+        assert is_valid_uuid(id_), f"{id_} is not a valid uuid"
         self._id = id_
 
     @classmethod
@@ -53,7 +54,9 @@ class SqlalchemyBase(CommonSqlalchemyMetaMixins, Base):
         """List records with optional cursor (for pagination) and limit."""
         with db_session as session:
             # Start with the base query filtered by kwargs
-            query = select(cls).filter_by(**kwargs)
+            # relationships are never loaded for list results: callers that need one must selectinload it explicitly,
+            # anything else (an N+1 lazy load per row) raises instead of silently querying
+            query = select(cls).filter_by(**kwargs).options(raiseload("*"))
 
             # Add a cursor condition if provided
             if cursor:
@@ -79,7 +82,7 @@ class SqlalchemyBase(CommonSqlalchemyMetaMixins, Base):
         """
         try:
             uuid_string = identifier.split("-", 1)[1] if indifferent else identifier.replace(f"{cls.__prefix__()}-", "")
-            assert is_valid_uuid4(uuid_string)
+            assert is_valid_uuid(uuid_string)
             return uuid_string
         except ValueError as e:
             raise ValueError(f"{identifier} is not a valid identifier for class {cls.__name__}") from e
@@ -107,12 +110,11 @@ class SqlalchemyBase(CommonSqlalchemyMetaMixins, Base):
         """
         del kwargs  # arity for more complex reads
         identifier = cls.get_uid_from_identifier(identifier)
-        query = select(cls).where(cls._id == identifier)
         # if actor:
         #     query = cls.apply_access_predicate(query, actor, access)
-        if hasattr(cls, "is_deleted"):
-            query = query.where(cls.is_deleted == False)
-        if found := db_session.execute(query).scalar():
+        # primary key lookup: served from the session's identity map when the row is already loaded
+        found = db_session.get(cls, identifier)
+        if found is not None and not getattr(found, "is_deleted", False):
             return found
         raise NoResultFound(f"{cls.__name__} with id {identifier} not found")
 
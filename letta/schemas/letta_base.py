@@ -1,10 +1,11 @@
-import uuid
 from logging import getLogger
 from typing import Optional
 from uuid import UUID
 
 from pydantic import BaseModel, ConfigDict, Field, field_validator
 
+from letta.utils import uuid7
+
 # from: https://gist.github.com/norton120/22242eadb80bf2cf1dd54a961b151c61
 
 
@@ -32,7 +33,8 @@ class LettaBase(BaseModel):
 
         # TODO: generate ID from regex pattern?
         def _generate_id() -> str:
-            return f"{prefix}-{uuid.uuid4()}"
+            # time-ordered, so new rows append to the end of the primary key index
+            return f"{prefix}-{uuid7()}"
 
         return Field(
             ...,
@@ -168,15 +168,12 @@ def upload_file_to_source(
         metadata_={"type": "embedding", "filename": file.filename, "source_id": source_id},
         completed_at=None,
     )
-    job_id = job.id
-    server.ms.create_job(job)
+    job = server.ms.create_job(job)
 
     # create background task
     background_tasks.add_task(load_file_to_source_async, server, source_id=source.id, job_id=job.id, file=file, bytes=bytes)
 
     # return job information
-    job = server.ms.get_job(job_id=job_id)
-    assert job is not None, "Job not found"
     return job
 
 
@@ -42,7 +42,7 @@ from letta.interface import AgentInterface  # abstract
 from letta.interface import CLIInterface  # for printing to terminal
 from letta.log import get_logger
 from letta.memory import get_memory_functions
-from letta.metadata import Base, MetadataStore
+from letta.metadata import Base, MetadataStore, get_engine
 from letta.o1_agent import O1Agent
 from letta.prompts import gpt_system
 from letta.providers import (
@@ -162,7 +162,7 @@ class Server(object):
         raise NotImplementedError
 
 
-from sqlalchemy import create_engine
+from sqlalchemy import inspect as inspect_db
 from sqlalchemy.orm import sessionmaker
 
 from letta.config import LettaConfig
@@ -179,17 +179,20 @@ if settings.letta_pg_uri_no_default:
     config.archival_storage_uri = settings.letta_pg_uri_no_default
 
     # create engine
-    engine = create_engine(settings.letta_pg_uri)
+    engine = get_engine(settings.letta_pg_uri)
 else:
     # TODO: don't rely on config storage
-    engine = create_engine("sqlite:///" + os.path.join(config.recall_storage_path, "sqlite.db"))
+    engine = get_engine("sqlite:///" + os.path.join(config.recall_storage_path, "sqlite.db"))
 
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# expire_on_commit=False: records are converted to pydantic right after commit, don't re-SELECT them
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 
 attach_base()
 
-Base.metadata.create_all(bind=engine)
+# one catalog query on warm starts instead of create_all's existence probe per table
+if not set(Base.metadata.tables).issubset(inspect_db(engine).get_table_names()):
+    Base.metadata.create_all(bind=engine)
 
 
 # Dependency
@@ -1575,8 +1578,10 @@ class SyncServer(Server):
 
     def api_key_to_user(self, api_key: str) -> str:
         """Decode an API key to a user"""
-        token = self.ms.get_api_key(api_key=api_key)
-        user = self.user_manager.get_user_by_id(token.user_id)
+        user_id = self.ms.get_user_id_for_api_key(api_key=api_key)
+        if user_id is None:
+            raise HTTPException(status_code=403, detail="Invalid credentials")
+        user = self.user_manager.get_user_by_id(user_id)
         if user is None:
             raise HTTPException(status_code=403, detail="Invalid credentials")
         else:
@@ -1649,8 +1654,7 @@ class SyncServer(Server):
             status=JobStatus.created,
             metadata_=metadata,
         )
-        self.ms.create_job(job)
-        return job
+        return self.ms.create_job(job)
 
     def delete_job(self, job_id: str):
         """Delete a job"""
@@ -1660,9 +1664,9 @@ class SyncServer(Server):
         """Get a job"""
         return self.ms.get_job(job_id)
 
-    def list_jobs(self, user_id: str) -> List[Job]:
-        """List all jobs for a user"""
-        return self.ms.list_jobs(user_id=user_id)
+    def list_jobs(self, user_id: str, cursor: Optional[str] = None, limit: Optional[int] = None) -> List[Job]:
+        """List all jobs for a user (or one page of them when `limit` is given)"""
+        return self.ms.list_jobs(user_id=user_id, cursor=cursor, limit=limit)
 
     def list_active_jobs(self, user_id: str) -> List[Job]:
         """List all active jobs for a user"""
@@ -1,9 +1,16 @@
-from typing import List, Optional, Tuple
+from typing import List, Optional
+
+from sqlalchemy import delete
 
 from letta.constants import DEFAULT_ORG_ID, DEFAULT_USER_ID, DEFAULT_USER_NAME
 
 # TODO: Remove this once we translate all of these to the ORM
-from letta.metadata import AgentModel, AgentSourceMappingModel, SourceModel
+from letta.metadata import (
+    DELETE_USER_CASCADE_SQL,
+    AgentModel,
+    AgentSourceMappingModel,
+    SourceModel,
+)
 from letta.orm.errors import NoResultFound
 from letta.orm.organization import Organization as OrganizationModel
 from letta.orm.user import User as UserModel
@@ -75,9 +82,11 @@ class UserManager:
 
             # TODO: Remove this once we have ORM models for the Agent, Source, and AgentSourceMapping
             # Cascade delete for related models: Agent, Source, AgentSourceMapping
-            session.query(AgentModel).filter(AgentModel.user_id == user_id).delete()
-            session.query(SourceModel).filter(SourceModel.user_id == user_id).delete()
-            session.query(AgentSourceMappingModel).filter(AgentSourceMappingModel.user_id == user_id).delete()
+            if session.get_bind().dialect.name == "postgresql":
+                session.execute(DELETE_USER_CASCADE_SQL, {"user_id": user_id})
+            else:
+                for model in (AgentModel, SourceModel, AgentSourceMappingModel):
+                    session.execute(delete(model).where(model.user_id == user_id).execution_options(synchronize_session=False))
 
             session.commit()
 
@@ -92,8 +101,8 @@ class UserManager:
                 raise ValueError(f"User with id {user_id} not found.")
 
     @enforce_types
-    def list_users(self, cursor: Optional[str] = None, limit: Optional[int] = 50) -> Tuple[Optional[str], List[PydanticUser]]:
-        """List users with pagination using cursor (id) and limit."""
+    def list_users(self, cursor: Optional[str] = None, limit: Optional[int] = 50) -> List[PydanticUser]:
+        """List users with pagination using cursor (id) and limit (UUIDv7 ids, so pages follow creation order to the millisecond)."""
         with self.session_maker() as session:
             results = UserModel.list(db_session=session, cursor=cursor, limit=limit)
             return [user.to_pydantic() for user in results]
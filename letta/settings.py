@@ -65,6 +65,13 @@ class Settings(BaseSettings):
     pg_port: Optional[int] = None
     pg_uri: Optional[str] = None  # option to specifiy full uri
 
+    # database connection pool (ignored for sqlite)
+    db_pool_size: int = 20
+    db_max_overflow: int = 40
+    db_pool_recycle: int = 1800  # seconds
+    db_pool_timeout: int = 30  # seconds to wait for a free connection before raising
+    db_pool_use_lifo: bool = True  # reuse the most recently returned connection so idle ones can be recycled
+
     # tools configuration
     load_default_external_tools: Optional[bool] = None
 
@@ -11,6 +11,7 @@ import random
 import re
 import subprocess
 import sys
+import time
 import uuid
 from contextlib import contextmanager
 from datetime import datetime, timedelta, timezone
@@ -516,13 +517,21 @@ def is_optional_type(hint):
 
 
 def enforce_types(func):
+    # the checks run on every call, set LETTA_ENFORCE_TYPES=0 or run under `python -O` (e.g. in production) to skip them
+    if not __debug__ or os.getenv("LETTA_ENFORCE_TYPES", "1") == "0":
+        return func
+
+    # Get the function's argument names
+    arg_names = inspect.getfullargspec(func).args
+    # type hints are resolved on the first call (forward references may not exist yet at decoration time) and reused
+    resolved_hints = []
+
     @wraps(func)
     def wrapper(*args, **kwargs):
-        # Get type hints, excluding the return type hint
-        hints = {k: v for k, v in get_type_hints(func).items() if k != "return"}
-
-        # Get the function's argument names
-        arg_names = inspect.getfullargspec(func).args
+        if not resolved_hints:
+            # Get type hints, excluding the return type hint
+            resolved_hints.append({k: v for k, v in get_type_hints(func).items() if k != "return"})
+        hints = resolved_hints[0]
 
         # Pair each argument with its corresponding type hint
         args_with_hints = dict(zip(arg_names[1:], args[1:]))  # Skipping 'self'
@@ -1060,6 +1069,18 @@ def create_uuid_from_string(val: str):
     return uuid.UUID(hex=hex_string)
 
 
+def uuid7() -> uuid.UUID:
+    """
+    Generate a time-ordered UUID (RFC 9562 version 7)
+    48-bit unix timestamp in ms, then 74 random bits, so ids created later sort later and B-tree inserts stay append-only
+    """
+    value = (time.time_ns() // 1_000_000) << 80 | int.from_bytes(os.urandom(10), "big")
+    # set the version (0111) and variant (10) bits
+    value = value & ~(0xF << 76) | (0x7 << 76)
+    value = value & ~(0x3 << 62) | (0x2 << 62)
+    return uuid.UUID(int=value)
+
+
 def json_dumps(data, indent=2):
     def safe_serializer(obj):
         if isinstance(obj, datetime):
@@ -1,5 +1,12 @@
+import copy
+import time
+import uuid
+import warnings
+
 import pytest
-from sqlalchemy import delete
+from sqlalchemy import delete, event, select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateIndex, CreateTable
 
 import letta.utils as utils
 from letta.constants import (
@@ -8,13 +15,22 @@ from letta.constants import (
     DEFAULT_USER_ID,
     DEFAULT_USER_NAME,
 )
+from letta.metadata import COPY_MIN_ROWS, AgentModel, AgentSourceMappingModel, FileMetadataModel
 from letta.orm.organization import Organization
 from letta.orm.user import User
 
 utils.DEBUG = True
 from letta.config import LettaConfig
+from letta.schemas.block import Block
+from letta.schemas.embedding_config import EmbeddingConfig
+from letta.schemas.enums import JobStatus
+from letta.schemas.file import FileMetadata
+from letta.schemas.job import Job
+from letta.schemas.source import Source
+from letta.schemas.tool import Tool
 from letta.schemas.user import UserCreate, UserUpdate
-from letta.server.server import SyncServer
+from letta.server.server import SyncServer, engine
+from letta.utils import uuid7
 
 
 @pytest.fixture(autouse=True)
@@ -102,6 +118,42 @@ def test_list_users(server: SyncServer):
     assert len(server.user_manager.list_users()) == 0
 
 
+def test_list_users_pagination(server: SyncServer):
+    org = server.organization_manager.create_default_organization()
+
+    # created within the same second, so pages can't rely on created_at
+    created = [server.user_manager.create_user(UserCreate(name=f"user_{i}", organization_id=org.id)) for i in range(5)]
+
+    first_page = server.user_manager.list_users(limit=2)
+    second_page = server.user_manager.list_users(cursor=first_page[-1].id, limit=2)
+    last_page = server.user_manager.list_users(cursor=second_page[-1].id, limit=2)
+    assert len(first_page) == 2
+    assert len(second_page) == 2
+    assert len(last_page) == 1
+
+    # every user exactly once across the pages
+    listed = [user.id for user in first_page + second_page + last_page]
+    assert sorted(listed) == sorted(user.id for user in created)
+
+
+def test_get_user_by_id_single_query(server: SyncServer):
+    org = server.organization_manager.create_default_organization()
+    user = server.user_manager.create_user(UserCreate(name="user", organization_id=org.id))
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        assert server.user_manager.get_user_by_id(user.id).id == user.id
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    # the organization relationship is not loaded along with the user
+    assert len(statements) == 1
+
+
 def test_create_default_user(server: SyncServer):
     org = server.organization_manager.create_default_organization()
     server.user_manager.create_default_user(org_id=org.id)
@@ -130,3 +182,215 @@ def test_update_user(server: SyncServer):
     user = server.user_manager.update_user(UserUpdate(id=user.id, organization_id=test_org.id))
     assert user.name == user_name_b
     assert user.organization_id == test_org.id
+
+
+# ======================================================================================================================
+# Metadata Store Tests
+# ======================================================================================================================
+def test_agents_tools_jsonb_ddl_on_postgres():
+    # the GIN index needs a jsonb column (plain json has no default GIN operator class)
+    dialect = postgresql.dialect()
+    assert "tools JSONB" in str(CreateTable(AgentModel.__table__).compile(dialect=dialect))
+    index = next(index for index in AgentModel.__table__.indexes if index.name == "agents_idx_tools")
+    assert "USING gin (tools)" in str(CreateIndex(index).compile(dialect=dialect))
+
+
+def test_job_records_are_validated(server: SyncServer):
+    user_id = f"user-{uuid.uuid4()}"
+    job = server.ms.create_job(Job(user_id=user_id, metadata_={"type": "test"}))
+
+    fetched = server.ms.get_job(job.id)
+    assert isinstance(fetched.status, JobStatus)
+    assert [j.id for j in server.ms.list_jobs(user_id=user_id)] == [job.id]
+    with warnings.catch_warnings():
+        # an unvalidated str status makes pydantic warn on serialization
+        warnings.simplefilter("error")
+        fetched.model_dump()
+
+    server.ms.delete_job(job.id)
+    assert server.ms.get_job(job.id) is None
+
+
+def test_update_jobs_only_stamps_completed_jobs(server: SyncServer):
+    user_id = f"user-{uuid.uuid4()}"
+    pending = server.ms.create_job(Job(user_id=user_id, status=JobStatus.created))
+    finishing = server.ms.create_job(Job(user_id=user_id, status=JobStatus.running))
+
+    # partial updates: only the fields set on each Job are written
+    server.ms.update_jobs(
+        [
+            Job(id=pending.id, user_id=user_id, metadata_={"step": 1}),
+            Job(id=finishing.id, user_id=user_id, status=JobStatus.completed),
+        ]
+    )
+
+    pending = server.ms.get_job(pending.id)
+    assert pending.status == JobStatus.created
+    assert pending.metadata_ == {"step": 1}
+    assert pending.completed_at is None
+    finishing = server.ms.get_job(finishing.id)
+    assert finishing.status == JobStatus.completed
+    assert finishing.completed_at is not None
+
+    server.ms.delete_jobs([pending.id, finishing.id])
+
+
+def test_unit_of_work_shares_one_connection(server: SyncServer):
+    user_id = f"user-{uuid.uuid4()}"
+    with server.ms.unit_of_work():
+        job = server.ms.create_job(Job(user_id=user_id))
+        # visible inside the unit before it commits, and streaming it leaves the shared connection untouched
+        assert [j.id for j in server.ms.list_jobs(user_id=user_id)] == [job.id]
+        with server.ms._connect() as conn:
+            assert "yield_per" not in conn.get_execution_options()
+    assert server.ms.get_job(job.id) is not None
+
+    server.ms.delete_job(job.id)
+
+
+def test_bulk_attach_sources_skips_attached(server: SyncServer):
+    user_id = f"user-{uuid.uuid4()}"
+    server.ms.attach_source(user_id=user_id, agent_id="agent-a", source_id="source-1")
+
+    # one already attached, one repeated in the batch
+    server.ms.bulk_attach_sources([(user_id, "agent-a", "source-1"), (user_id, "agent-a", "source-2"), (user_id, "agent-a", "source-2")])
+
+    with server.ms.session_maker() as session:
+        query = select(AgentSourceMappingModel.source_id).where(AgentSourceMappingModel.user_id == user_id)
+        assert sorted(session.execute(query).scalars()) == ["source-1", "source-2"]
+        session.execute(delete(AgentSourceMappingModel).where(AgentSourceMappingModel.user_id == user_id))
+        session.commit()
+
+
+def test_bulk_attach_sources_skips_attached_in_large_batches(server: SyncServer):
+    # COPY_MIN_ROWS or more mappings take the COPY path on postgres
+    user_id = f"user-{uuid.uuid4()}"
+    server.ms.attach_source(user_id=user_id, agent_id="agent-a", source_id="source-0")
+
+    server.ms.bulk_attach_sources([(user_id, "agent-a", f"source-{i}") for i in range(COPY_MIN_ROWS + 1)])
+
+    with server.ms.session_maker() as session:
+        query = select(AgentSourceMappingModel.source_id).where(AgentSourceMappingModel.user_id == user_id)
+        assert len(session.execute(query).scalars().all()) == COPY_MIN_ROWS + 1
+        session.execute(delete(AgentSourceMappingModel).where(AgentSourceMappingModel.user_id == user_id))
+        session.commit()
+
+
+def test_lazy_agent_state_copy():
+    lazy_agent = AgentModel(id="agent-lazy", name="lazy").to_lazy_record()
+    copied = copy.copy(lazy_agent)
+    assert (copied.id, copied.name) == ("agent-lazy", "lazy")
+
+
+def test_uuid7_is_time_ordered():
+    first = uuid7()
+    time.sleep(0.002)
+    second = uuid7()
+    assert first.version == second.version == 7
+    assert str(first) < str(second)
+
+
+def test_bulk_create_records(server: SyncServer):
+    user_id = f"user-{uuid.uuid4()}"
+    embedding_config = EmbeddingConfig.default_config(provider="openai")
+
+    sources = [Source(name=f"source_{i}", user_id=user_id, embedding_config=embedding_config) for i in range(3)]
+    server.ms.create_sources(sources)
+    assert sorted(source.name for source in server.ms.list_sources(user_id=user_id)) == ["source_0", "source_1", "source_2"]
+    # keyset pages over the same rows
+    first_page = server.ms.list_sources(user_id=user_id, limit=2)
+    assert len(first_page) == 2
+    assert len(server.ms.list_sources(user_id=user_id, cursor=first_page[-1].id, limit=2)) == 1
+
+    tools = [Tool(name=f"tool_{i}", user_id=user_id, tags=[], source_code="def f(): pass") for i in range(2)]
+    server.ms.create_tools(tools)
+    assert {tool.name for tool in server.ms.list_tools(user_id=user_id)} >= {"tool_0", "tool_1"}
+
+    blocks = [Block(name=f"human_{i}", label="human", value=f"human {i}", user_id=user_id) for i in range(2)]
+    server.ms.create_blocks(blocks)
+    assert len(server.ms.get_blocks(user_id=user_id, label="human")) == 2
+
+    jobs = [Job(user_id=user_id) for _ in range(3)]
+    server.ms.create_jobs(jobs)
+    assert sorted(job.id for job in server.ms.list_jobs(user_id=user_id)) == sorted(job.id for job in jobs)
+
+    for source in sources:
+        server.ms.delete_source(source.id)
+    server.ms.delete_tools([tool.name for tool in tools], user_id=user_id)
+    server.ms.delete_blocks([block.id for block in blocks])
+    server.ms.delete_jobs([job.id for job in jobs])
+    assert server.ms.list_sources(user_id=user_id) == []
+    assert server.ms.get_blocks(user_id=user_id) is None
+    assert server.ms.list_jobs(user_id=user_id) == []
+
+
+def test_bulk_insert_files(server: SyncServer):
+    user_id = f"user-{uuid.uuid4()}"
+    source_id = f"source-{uuid.uuid4()}"
+    files = [FileMetadata(user_id=user_id, source_id=source_id, file_name=f"file_{i}.txt", file_size=i) for i in range(3)]
+    server.ms.bulk_insert_files(files)
+
+    first_page = server.ms.list_files_from_source(source_id=source_id, limit=2, cursor=None)
+    second_page = server.ms.list_files_from_source(source_id=source_id, limit=2, cursor=first_page[-1].id)
+    assert sorted(f.file_name for f in first_page + second_page) == ["file_0.txt", "file_1.txt", "file_2.txt"]
+
+    with server.ms.session_maker() as session:
+        session.execute(delete(FileMetadataModel).where(FileMetadataModel.source_id == source_id))
+        session.commit()
+
+
+def test_list_jobs_batch(server: SyncServer):
+    user_a, user_b, user_c = (f"user-{uuid.uuid4()}" for _ in range(3))
+    jobs = [Job(user_id=user_a), Job(user_id=user_a), Job(user_id=user_b)]
+    server.ms.create_jobs(jobs)
+
+    batch = server.ms.list_jobs_batch([user_a, user_b, user_c])
+    assert sorted(job.id for job in batch[user_a]) == sorted(job.id for job in jobs[:2])
+    assert [job.id for job in batch[user_b]] == [jobs[2].id]
+    # every requested user is a key, even without jobs
+    assert batch[user_c] == []
+
+    server.ms.delete_jobs([job.id for job in jobs])
+
+
+def test_transaction_rolls_back_on_error(server: SyncServer):
+    user_id = f"user-{uuid.uuid4()}"
+    with pytest.raises(RuntimeError):
+        with server.ms.transaction() as txn:
+            txn.create_job(Job(user_id=user_id))
+            raise RuntimeError("abort")
+    assert server.ms.list_jobs(user_id=user_id) == []
+
+    with server.ms.transaction() as txn:
+        job = txn.create_job(Job(user_id=user_id))
+        txn.update_job_status(job.id, JobStatus.completed)
+    assert server.ms.get_job(job.id).status == JobStatus.completed
+
+    server.ms.delete_job(job.id)
+
+
+def test_create_tool_if_missing(server: SyncServer):
+    user_id = f"user-{uuid.uuid4()}"
+    public_name = f"public_{uuid.uuid4().hex}"
+
+    assert server.ms.create_tool_if_missing(Tool(name=public_name, tags=[], source_code="def f(): pass"))
+    # a public tool with the same name is visible to the user, so nothing is inserted
+    assert not server.ms.create_tool_if_missing(Tool(name=public_name, user_id=user_id, tags=[], source_code="def f(): pass"))
+    assert server.ms.create_tool_if_missing(Tool(name="own_tool", user_id=user_id, tags=[], source_code="def f(): pass"))
+    assert not server.ms.create_tool_if_missing(Tool(name="own_tool", user_id=user_id, tags=[], source_code="def g(): pass"))
+
+    assert server.ms.get_tool(tool_name="own_tool", user_id=user_id).source_code == "def f(): pass"
+    server.ms.delete_tools([public_name], user_id=None)
+    server.ms.delete_tools(["own_tool"], user_id=user_id)
+
+
+def test_api_key_lookup(server: SyncServer):
+    user_id = f"user-{uuid.uuid4()}"
+    api_key = server.ms.create_api_key(user_id=user_id, name="test_key")
+
+    assert server.ms.get_api_key(api_key=api_key.key).id == api_key.id
+    assert server.ms.get_user_id_for_api_key(api_key.key) == user_id
+    assert server.ms.get_user_id_for_api_key("sk-not-a-key") is None
+
+    server.ms.delete_api_key(api_key=api_key.key)
+    assert server.ms.get_user_id_for_api_key(api_key.key) is None